@@ -1,82 +1,381 @@
 import logging
-from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, BaseMessage
+import re
+from typing import Callable
+from langchain_core.messages import AIMessage, ToolMessage, BaseMessage
 
+import config
+from budgets import BudgetExceededError, RunBudget
+from footer_matcher import FOOTER_ITEMS, FooterScan, resolve_footer_links
+from form_replay import REPLAYABLE_TOOLS, FormTraceRecorder, FormTraceStore
+from history_manager import MessageHistory, estimate_tokens
+from llm_cache import LLMResponseCache, page_fingerprint
+from perf_trace import PerfTracer
 from prompts import PROMPTS
+from rate_limiter import LLMRateLimiter
+from tcpa_detector import TcpaCandidate, confirm_tcpa_disclaimer
 from tool_manager import ToolManager
 
 logger = logging.getLogger(__name__)
 
+# Tools that can change the page, the TCPA detector runs again after them.
+PAGE_ACTION_TOOLS = {"click", "fill", "form_actions"}
 
-def run_fsm_agent(llm, tool_manager: ToolManager):
+# How the state summaries phrase a finding, in the words main.py parses.
+SUMMARY_FOUND_PATTERNS = {
+    "privacy_policy": re.compile(r"privacy policy: found"),
+    "terms": re.compile(r"terms( of service| and conditions)?: found"),
+    "do_not_sell": re.compile(r"(do not sell|dns|dmca): found"),
+}
+TCPA_FOUND_PATTERN = re.compile(r"tcpa found|tcpa disclaimer: found")
+
+
+def build_state_prompt(
+    state: str, state_summaries: list[str], footer_scan: FooterScan | None
+) -> str:
+    """Adds what is already known from earlier states to the state's prompt."""
+    prompt = PROMPTS[state]
+    if state == "FOOTER_ANALYSIS" and footer_scan and footer_scan.found:
+        remaining = ", ".join(
+            FOOTER_ITEMS[item]["label"] for item in footer_scan.unresolved
+        )
+        prompt += (
+            f"\n**Already verified and screenshotted:** {footer_scan.summary()}.\n"
+            f"Only look for the remaining item(s): {remaining}. "
+            "Repeat the already verified items unchanged in your final summary.\n"
+        )
+    if state == "DISCLAIMER_VERIFICATION" and state_summaries:
+        prompt += "\n**Findings from the earlier states:**\n" + "\n".join(
+            state_summaries
+        )
+    return prompt
+
+
+def build_rule_based_report(
+    footer_scan: FooterScan | None, tcpa_match: TcpaCandidate | None
+) -> str | None:
+    """
+    The final report, if every item was confirmed by the rule-based passes.
+    Anything less still goes through the DISCLAIMER_VERIFICATION state.
+    """
+    if not footer_scan or footer_scan.unresolved or not tcpa_match:
+        return None
+    lines = [f"{spec['label']}: Found" for spec in FOOTER_ITEMS.values()]
+    lines.append("TCPA Disclaimer: Found")
+    return "\n".join(lines) + "\n\nVERIFICATION_COMPLETE"
+
+
+def build_partial_report(
+    screenshots: set[str], state_summaries: list[str], budget_hit: str
+) -> str:
+    """
+    The final report when a budget ran out before the LLM could write it,
+    built from the screenshots saved so far and the earlier state summaries.
+    """
+    findings = "\n".join(state_summaries).lower()
+    lines = []
+    for item, spec in FOOTER_ITEMS.items():
+        found = spec["filename"] in screenshots or SUMMARY_FOUND_PATTERNS[item].search(
+            findings
+        )
+        lines.append(f"{spec['label']}: {'Found' if found else 'Not Found'}")
+    tcpa_found = "tcpa_disclaimer.png" in screenshots or TCPA_FOUND_PATTERN.search(
+        findings
+    )
+    lines.append(f"TCPA Disclaimer: {'Found' if tcpa_found else 'Not Found'}")
+    return (
+        "\n".join(lines)
+        + f"\n\nPartial report: the {budget_hit} budget ran out.\n\nVERIFICATION_COMPLETE"
+    )
+
+
+def preempt_state(
+    state: str, budget_hit: str, screenshots: list[str], state_summaries: list[str]
+) -> tuple[str, str | None]:
+    """
+    Ends the state whose budget ran out. Returns the next state and, if the
+    run ends here, the partial report; earlier states skip to the report.
+    """
+    if state == "DISCLAIMER_VERIFICATION":
+        return "FINISHED", build_partial_report(
+            set(screenshots), state_summaries, budget_hit
+        )
+    saved = ", ".join(screenshots) or "none"
+    state_summaries.append(
+        f"{state} stopped early, the {budget_hit} budget ran out. "
+        f"Screenshots saved so far: {saved}."
+    )
+    return "DISCLAIMER_VERIFICATION", None
+
+
+def run_fsm_agent(
+    llm,
+    tool_manager: ToolManager,
+    footer_prepass: bool = config.FOOTER_PREPASS,
+    llm_cache: LLMResponseCache | None = None,
+    tracer: PerfTracer | None = None,
+    form_traces: FormTraceStore | None = None,
+    rate_limiter: LLMRateLimiter | None = None,
+    budget: RunBudget | None = None,
+    trace_sink: Callable[[str, list[BaseMessage]], None] | None = None,
+):
+    """
+    Runs the FSM for the page of `tool_manager` and returns (final report,
+    thoughts). With a `trace_sink`, the message history of every state is
+    handed to it as soon as the state ends and thoughts is empty; otherwise
+    thoughts is the message history of the last state as text.
+    """
     current_state = "FOOTER_ANALYSIS"
     max_steps_per_state = 35  # Increased for multi-step states
     final_output = "Agent did not finish."
+    # Final messages of the finished states, the report state needs them.
+    state_summaries: list[str] = []
+    tracer = tracer or PerfTracer()
+    budget = budget or RunBudget()
+    screenshot_tool = tool_manager.get_tool("screenshot_element")
+
+    footer_scan = None
+    if footer_prepass:
+        with tracer.span("footer_prepass") as prepass_span:
+            footer_scan = resolve_footer_links(tool_manager)
+            prepass_span["resolved"] = len(footer_scan.found)
+        if not footer_scan.unresolved:
+            logger.info(
+                "Footer pre-pass resolved every link, skipping the LLM for FOOTER_ANALYSIS."
+            )
+            state_summaries.append(
+                f"{footer_scan.summary()}. Finished with footer analysis."
+            )
+            current_state = "FORM_NAVIGATION"
 
     llm_with_tools = llm.bind_tools(tool_manager.tools)
+    if rate_limiter:
+        # Cache hits are served before the limiter and don't use any quota.
+        llm_with_tools = rate_limiter.wrap(llm_with_tools, deadline=budget.deadline)
     tool_map = {tool.name: tool for tool in tool_manager.tools}
 
-    message_history: list[BaseMessage] = []  # Ensure it's always defined
+    message_history = MessageHistory("")  # Ensure it's always defined
+    tcpa_match = None
 
     while current_state != "FINISHED":
         logger.info(f"--- Entering State: {current_state} ---")
-        prompt_template = PROMPTS[current_state]
+        budget.start_state(current_state)
+        if current_state == "DISCLAIMER_VERIFICATION":
+            rule_based_report = build_rule_based_report(footer_scan, tcpa_match)
+            if rule_based_report:
+                logger.info(
+                    "Every item was confirmed by rules, skipping the LLM report."
+                )
+                final_output = rule_based_report
+                current_state = "FINISHED"
+                continue
+            budget_hit = budget.exceeded()
+            if budget_hit:
+                final_output = build_partial_report(
+                    set(screenshot_tool.saved_paths), state_summaries, budget_hit
+                )
+                current_state = "FINISHED"
+                continue
 
-        message_history: list[BaseMessage] = [HumanMessage(content=prompt_template)]
+        prompt_template = build_state_prompt(
+            current_state, state_summaries, footer_scan
+        )
 
-        for i in range(max_steps_per_state):
-            logger.info(f"Step {i+1} in state '{current_state}'")
+        message_history = MessageHistory(prompt_template)
 
-            ai_response = llm_with_tools.invoke(message_history)
-            message_history.append(ai_response)
+        state_name = current_state
+        tcpa_check_pending = current_state == "FORM_NAVIGATION"
+        recorder = None
+        replay = None
+        try:
+            with tracer.span(f"state:{state_name}") as state_span:
+                if current_state == "FORM_NAVIGATION" and form_traces:
+                    # Replay the steps that worked on an earlier site with the same
+                    # form, the LLM takes over from wherever the replay stops.
+                    with tracer.span("form_replay") as replay_span:
+                        recorder = FormTraceRecorder(tool_manager, form_traces)
+                        replay = recorder.replay()
+                        replay_span["steps"] = replay.steps_run
+                        replay_span["completed"] = replay.completed
+                # After the replay, whose scans never reach the history: the
+                # first scan the LLM sees must be a full one.
+                tool_manager.reset_scan_baseline()
+                for i in range(max_steps_per_state):
+                    if tcpa_check_pending:
+                        tcpa_check_pending = False
+                        with tracer.span("tcpa_detector") as detector_span:
+                            tcpa_match = confirm_tcpa_disclaimer(tool_manager)
+                            detector_span["confirmed"] = tcpa_match is not None
+                        if tcpa_match:
+                            state_summaries.append(
+                                f"TCPA Found (rule-based, confidence {tcpa_match.confidence:.2f}). "
+                                "Finished with form navigation."
+                            )
+                            current_state = "DISCLAIMER_VERIFICATION"
+                            break
+                        if replay and replay.tcpa_screenshot:
+                            state_summaries.append(
+                                "TCPA Found (replayed from a recorded form trace). "
+                                "Finished with form navigation."
+                            )
+                            current_state = "DISCLAIMER_VERIFICATION"
+                            break
+                        replay = None
 
-            if not ai_response.tool_calls:
-                logger.warning(
-                    "LLM did not request a tool. Analyzing its final content for state transition..."
-                )
-                final_content = ai_response.content
-
-                if "Finished with footer analysis." in final_content:
-                    current_state = "FORM_NAVIGATION"
-                    break
-                # New condition: If TCPA is found early jump straight to the final report.
-                elif (
-                    "TCPA Found" in final_content
-                    or "Finished with form navigation" in final_content
-                ):
-                    current_state = "DISCLAIMER_VERIFICATION"
-                    break
-                elif "VERIFICATION_COMPLETE" in final_content:
-                    final_output = final_content
-                    current_state = "FINISHED"
-                    break
+                    budget_hit = budget.exceeded()
+                    if budget_hit:
+                        current_state, report = preempt_state(
+                            current_state,
+                            budget_hit,
+                            screenshot_tool.saved_paths,
+                            state_summaries,
+                        )
+                        final_output = report or final_output
+                        break
 
-                else:
-                    logger.warning(
-                        f"No tool call and no state transition signal. Agent is stuck in state {current_state}."
-                    )
-                    final_output = f"Agent got stuck in state {current_state}. Final content: {final_content}"
-                    current_state = "FINISHED"
-                    break
+                    logger.info(f"Step {i+1} in state '{current_state}'")
+                    state_span["steps"] = i + 1
+
+                    messages_to_send = message_history.for_invoke()
+                    try:
+                        with tracer.span("llm", state=current_state) as llm_span:
+                            if llm_cache:
+                                ai_response = llm_cache.invoke(
+                                    llm_with_tools,
+                                    messages_to_send,
+                                    current_state,
+                                    page_fingerprint(tool_manager.page),
+                                )
+                            else:
+                                ai_response = llm_with_tools.invoke(messages_to_send)
+                            usage = getattr(ai_response, "usage_metadata", None) or {}
+                            llm_span["input_tokens"] = usage.get("input_tokens")
+                            llm_span["output_tokens"] = usage.get("output_tokens")
+                            cache_hit = bool(
+                                ai_response.response_metadata.get("cache_hit")
+                            )
+                            llm_span["cache_hit"] = cache_hit
+                            queue_wait_ms = (
+                                None
+                                if cache_hit
+                                else ai_response.response_metadata.get("queue_wait_ms")
+                            )
+                            llm_span["queue_wait_ms"] = queue_wait_ms
+                    except BudgetExceededError as e:
+                        # The rate limiter would have waited past the budget.
+                        logger.warning(str(e))
+                        current_state, report = preempt_state(
+                            current_state,
+                            budget.expire(),
+                            screenshot_tool.saved_paths,
+                            state_summaries,
+                        )
+                        final_output = report or final_output
+                        break
+                    if queue_wait_ms is not None:
+                        tracer.record("llm_queue_wait", queue_wait_ms)
+                    if not cache_hit:
+                        budget.add_tokens(
+                            (usage.get("input_tokens") or 0)
+                            + (usage.get("output_tokens") or 0)
+                        )
+                    message_history.append(ai_response)
 
-            for tool_call in ai_response.tool_calls:
-                tool_to_call = tool_map.get(tool_call["name"])
-                if not tool_to_call:
-                    observation = f"Error: Tool '{tool_call['name']}' not found."
-                else:
                     logger.info(
-                        f"Invoking tool: {tool_call['name']} with args: {tool_call['args']}"
+                        f"Step {i+1} sent ~{estimate_tokens(messages_to_send)} tokens "
+                        f"(full history ~{estimate_tokens(message_history.messages)}, "
+                        f"reported input tokens: {usage.get('input_tokens', 'n/a')})."
                     )
-                    observation = tool_to_call.invoke(tool_call["args"])
 
-                logger.info(f"Tool Observation: {observation}")
+                    if not ai_response.tool_calls:
+                        logger.warning(
+                            "LLM did not request a tool. Analyzing its final content for state transition..."
+                        )
+                        final_content = ai_response.content
 
-                message_history.append(
-                    ToolMessage(content=str(observation), tool_call_id=tool_call["id"])
-                )
-        else:
-            logger.warning(f"Max steps reached for state '{current_state}'.")
-            final_output = f"Agent reached max steps in state {current_state}."
-            current_state = "FINISHED"
+                        if "Finished with footer analysis." in final_content:
+                            state_summaries.append(final_content)
+                            current_state = "FORM_NAVIGATION"
+                            break
+                        # New condition: If TCPA is found early jump straight to the final report.
+                        elif (
+                            "TCPA Found" in final_content
+                            or "Finished with form navigation" in final_content
+                        ):
+                            state_summaries.append(final_content)
+                            current_state = "DISCLAIMER_VERIFICATION"
+                            break
+                        elif "VERIFICATION_COMPLETE" in final_content:
+                            final_output = final_content
+                            current_state = "FINISHED"
+                            break
+
+                        else:
+                            logger.warning(
+                                f"No tool call and no state transition signal. Agent is stuck in state {current_state}."
+                            )
+                            final_output = f"Agent got stuck in state {current_state}. Final content: {final_content}"
+                            current_state = "FINISHED"
+                            break
+
+                    for tool_call in ai_response.tool_calls:
+                        tool_to_call = tool_map.get(tool_call["name"])
+                        if not tool_to_call:
+                            observation = (
+                                f"Error: Tool '{tool_call['name']}' not found."
+                            )
+                        else:
+                            logger.info(
+                                f"Invoking tool: {tool_call['name']} with args: {tool_call['args']}"
+                            )
+                            fingerprint = ""
+                            if recorder and tool_call["name"] in REPLAYABLE_TOOLS:
+                                fingerprint = recorder.fingerprint()
+                            with tracer.span(
+                                f"tool:{tool_call['name']}", state=current_state
+                            ):
+                                observation = tool_to_call.invoke(tool_call["args"])
+                            if recorder:
+                                recorder.record(
+                                    fingerprint,
+                                    tool_call["name"],
+                                    tool_call["args"],
+                                    observation,
+                                )
+                            if (
+                                current_state == "FORM_NAVIGATION"
+                                and tool_call["name"] in PAGE_ACTION_TOOLS
+                            ):
+                                tcpa_check_pending = True
+
+                        logger.info(f"Tool Observation: {observation}")
+
+                        message_history.append(
+                            ToolMessage(
+                                content=str(observation), tool_call_id=tool_call["id"]
+                            )
+                        )
+                else:
+                    logger.warning(f"Max steps reached for state '{current_state}'.")
+                    final_output = f"Agent reached max steps in state {current_state}."
+                    current_state = "FINISHED"
+
+            if (
+                recorder
+                and current_state == "DISCLAIMER_VERIFICATION"
+                and "TCPA Found" in state_summaries[-1]
+            ):
+                recorder.save()
+        finally:
+            # Also on errors, the history of a failed state is the one worth reading.
+            if trace_sink:
+                try:
+                    trace_sink(state_name, message_history.messages)
+                except Exception as e:
+                    logger.error(
+                        f"Could not store the trace of state {state_name}: {e}"
+                    )
 
-    full_thought_history = "\n\n".join(str(m) for m in message_history)
+    if trace_sink:
+        return final_output, ""
+    full_thought_history = "\n\n".join(str(m) for m in message_history.messages)
     return final_output, full_thought_history
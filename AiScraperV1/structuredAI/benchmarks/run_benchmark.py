@@ -0,0 +1,218 @@
+"""
+Offline end-to-end benchmark of the verification pipeline.
+
+Serves the sites in benchmarks/fixtures from a local HTTP server, runs
+main_run over them with the ScriptedChatModel instead of Gemini and reports
+throughput, per-stage latency, peak memory and how many rows match the
+expected findings. Nothing leaves the machine, so numbers are comparable
+across commits:
+
+    python benchmarks/run_benchmark.py --repeat 5 --workers 2 --json bench.json
+"""
+
+import argparse
+import csv
+import functools
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import main  # noqa: E402
+from process_memory import PeakMemorySampler  # noqa: E402
+from scripted_llm import ScriptedChatModel  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_DIR = os.path.join(BENCHMARK_DIR, "fixtures")
+
+# Expected result columns per fixture site.
+FIXTURES = {
+    "standard": {
+        "privacy_policy_found": True,
+        "tos_found": True,
+        "dmca_found": True,
+        "disclaimer_found": True,
+    },
+    "footer_variants": {
+        "privacy_policy_found": True,
+        "tos_found": True,
+        "dmca_found": True,
+        "disclaimer_found": True,
+    },
+    "multi_step": {
+        "privacy_policy_found": True,
+        "tos_found": True,
+        "dmca_found": True,
+        "disclaimer_found": True,
+    },
+    "new_tab": {
+        "privacy_policy_found": True,
+        "tos_found": True,
+        "dmca_found": False,
+        "disclaimer_found": True,
+    },
+    "tcpa_top": {
+        "privacy_policy_found": True,
+        "tos_found": True,
+        "dmca_found": True,
+        "disclaimer_found": True,
+    },
+    "no_tcpa": {
+        "privacy_policy_found": True,
+        "tos_found": False,
+        "dmca_found": False,
+        "disclaimer_found": False,
+    },
+}
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_fixtures() -> ThreadingHTTPServer:
+    handler = functools.partial(_QuietHandler, directory=FIXTURES_DIR)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(
+        target=server.serve_forever, name="fixture-server", daemon=True
+    ).start()
+    return server
+
+
+def check_results(results_csv: str) -> tuple[int, int, list[str]]:
+    """Compares the results CSV with FIXTURES. Returns (correct, total, mismatches)."""
+    correct, total, mismatches = 0, 0, []
+    with open(results_csv, newline="", encoding="utf-8") as infile:
+        for row in csv.DictReader(infile):
+            site = row["url"].split("/")[3]
+            total += 1
+            wrong = [
+                column
+                for column, expected in FIXTURES[site].items()
+                if (row.get(column) == "True") != expected
+            ]
+            if wrong:
+                mismatches.append(f"{row['url']}: {', '.join(wrong)}")
+            else:
+                correct += 1
+    return correct, total, mismatches
+
+
+def run_benchmark(repeat: int, workers: int, llm_latency_ms: int) -> dict:
+    server = serve_fixtures()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    # The query string keeps the preflight from dropping repeats as duplicates.
+    urls = [
+        f"{base_url}/{site}/index.html?repeat={n}"
+        for n in range(repeat)
+        for site in FIXTURES
+    ]
+
+    workdir = tempfile.mkdtemp(prefix="verify_bench_")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        input_csv = os.path.join(workdir, "input_urls.csv")
+        with open(input_csv, "w", newline="", encoding="utf-8") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(["URL"])
+            writer.writerows([url] for url in urls)
+
+        results_csv = os.path.join(workdir, "results.csv")
+        start = time.perf_counter()
+        with PeakMemorySampler() as memory:
+            summary = main.main_run(
+                workers=workers,
+                llm_cache_mode="off",
+                output_csv_path=results_csv,
+                input_csv_path=input_csv,
+                llm=ScriptedChatModel(latency_ms=llm_latency_ms),
+            )
+        elapsed = time.perf_counter() - start
+        correct, total, mismatches = check_results(results_csv)
+    finally:
+        os.chdir(previous_cwd)
+        server.shutdown()
+
+    # Failed rows finish fast, so a throughput number would only be misleading.
+    passed = total == len(urls) and correct == total
+    return {
+        "urls": len(urls),
+        "workers": workers,
+        "llm_latency_ms": llm_latency_ms,
+        "passed": passed,
+        "wall_s": round(elapsed, 2),
+        "urls_per_min": round(len(urls) / elapsed * 60, 1) if passed else None,
+        "peak_rss_mb": (
+            round(memory.peak_mb, 1) if memory.peak_mb is not None else None
+        ),
+        "correct_rows": correct,
+        "total_rows": total,
+        "mismatches": mismatches,
+        "stages": summary["stages"] if summary else {},
+        "workdir": workdir,
+    }
+
+
+def print_report(report: dict):
+    print(
+        f"\nURLs: {report['urls']}  workers: {report['workers']}  LLM latency: {report['llm_latency_ms']} ms"
+    )
+    if report["passed"]:
+        print(
+            f"Wall time: {report['wall_s']} s  Throughput: {report['urls_per_min']} URLs/min"
+        )
+    else:
+        print(
+            f"FAILED: {report['correct_rows']} of {report['urls']} rows correct, "
+            f"no throughput reported (wall time {report['wall_s']} s)."
+        )
+    print(f"Peak RSS (Python + browser processes): {report['peak_rss_mb']} MB")
+    print(f"Correct rows: {report['correct_rows']}/{report['total_rows']}")
+    for mismatch in report["mismatches"]:
+        print(f"  mismatch: {mismatch}")
+    print(f"\n{'stage':<32}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}{'total s':>12}")
+    for stage, stats in report["stages"].items():
+        print(
+            f"{stage:<32}{stats['count']:>8}{stats['p50_ms']:>12}{stats['p95_ms']:>12}{stats['total_s']:>12}"
+        )
+    print(f"\nArtifacts: {report['workdir']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline benchmark of the verification pipeline."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="How many times to run every fixture site.",
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--llm-latency-ms",
+        type=int,
+        default=0,
+        help="Delay added to every scripted LLM call to mimic a real model.",
+    )
+    parser.add_argument("--json", help="Also write the report to this JSON file.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    report = run_benchmark(args.repeat, args.workers, args.llm_latency_ms)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as outfile:
+            json.dump(report, outfile, indent=2)
+    if not report["passed"]:
+        sys.exit(1)
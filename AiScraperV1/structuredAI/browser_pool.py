@@ -0,0 +1,161 @@
+import logging
+from contextlib import contextmanager
+
+from playwright.sync_api import Browser, BrowserContext, Playwright
+
+import config
+from network_profile import NetworkBlocker
+from process_memory import processes_rss_mb, rss_supported
+
+logger = logging.getLogger(__name__)
+
+_rss_warning_logged = False
+
+
+class BrowserPool:
+    """
+    Owns the browser of one worker thread and hands out a fresh context per URL.
+
+    Cookies, service workers and tabs opened by a URL die with its context, so
+    nothing carries over to the next site. The browser itself is restarted
+    after `recycle_after` URLs or as soon as its processes use more than
+    `max_rss_mb`, which keeps memory bounded on long runs. Like every sync
+    Playwright object, a pool may only be used from the thread that created it.
+    """
+
+    def __init__(
+        self,
+        playwright: Playwright,
+        headless: bool = config.HEADLESS,
+        launch_timeout: int = config.PAGE_LOAD_TIMEOUT_MS,
+        block_resources: bool = False,
+        recycle_after: int = config.BROWSER_RECYCLE_AFTER,
+        max_rss_mb: int = config.BROWSER_MAX_RSS_MB,
+    ):
+        self.playwright = playwright
+        self.headless = headless
+        self.launch_timeout = launch_timeout
+        self.block_resources = block_resources
+        self.recycle_after = recycle_after
+        self.max_rss_mb = max_rss_mb
+
+        self.browser: Browser | None = None
+        self._cdp_session = None
+        self.launches = 0
+        self.urls_since_launch = 0
+        self.urls_total = 0
+        self.last_rss_mb: float | None = None
+        self.peak_rss_mb = 0.0
+        global _rss_warning_logged
+        if self.max_rss_mb and not rss_supported() and not _rss_warning_logged:
+            _rss_warning_logged = True
+            logger.warning(
+                "Browser memory cannot be measured on this system, the browser is "
+                f"only recycled every {self.recycle_after} URLs."
+            )
+
+    def _launch(self):
+        self.browser = self.playwright.chromium.launch(
+            headless=self.headless, timeout=self.launch_timeout
+        )
+        self.launches += 1
+        self.urls_since_launch = 0
+        try:
+            self._cdp_session = self.browser.new_browser_cdp_session()
+        except Exception as e:
+            self._cdp_session = None
+            logger.warning(f"Browser memory cannot be measured: {e}")
+        logger.info(f"Browser launched (launch #{self.launches}).")
+
+    def _close_browser(self):
+        if self.browser:
+            try:
+                self.browser.close()
+            except Exception as e:
+                logger.warning(f"Error while closing the browser: {e}")
+            self.browser = None
+            self._cdp_session = None
+            logger.info("Browser closed.")
+
+    def browser_rss_mb(self) -> float | None:
+        """Resident memory of the browser's processes, None if it cannot be measured."""
+        if not self._cdp_session or not rss_supported():
+            return None
+        try:
+            info = self._cdp_session.send("SystemInfo.getProcessInfo")
+        except Exception as e:
+            logger.debug(f"Could not read browser process info: {e}")
+            return None
+        return processes_rss_mb(process["id"] for process in info["processInfo"])
+
+    def _recycle_reason(self) -> str | None:
+        if self.recycle_after and self.urls_since_launch >= self.recycle_after:
+            return f"{self.urls_since_launch} URLs since launch"
+        if (
+            self.max_rss_mb
+            and self.last_rss_mb is not None
+            and self.last_rss_mb > self.max_rss_mb
+        ):
+            return f"browser RSS {self.last_rss_mb:.0f} MB > {self.max_rss_mb} MB"
+        return None
+
+    @contextmanager
+    def context(self):
+        """
+        Yields a new context for one URL. Afterwards every page it opened is
+        closed along with the context, and the browser is recycled if needed.
+        Raises if the browser cannot be (re)launched or the context not be
+        created, the next call then tries with a new browser.
+        """
+        try:
+            if self.browser is None or not self.browser.is_connected():
+                self._close_browser()
+                self._launch()
+            context: BrowserContext = self.browser.new_context()
+            blocker = None
+            if self.block_resources:
+                blocker = NetworkBlocker()
+                blocker.attach(context)
+        except Exception:
+            # Start from a fresh browser on the next call.
+            self._close_browser()
+            raise
+        try:
+            yield context
+        finally:
+            if blocker:
+                logger.info(f"Network profile: {blocker.stats()}")
+            for page in list(context.pages):
+                try:
+                    page.close()
+                except Exception:
+                    pass
+            try:
+                context.close()
+            except Exception as e:
+                logger.warning(f"Error while closing the browser context: {e}")
+
+            self.urls_since_launch += 1
+            self.urls_total += 1
+            self.last_rss_mb = self.browser_rss_mb()
+            if self.last_rss_mb is not None:
+                self.peak_rss_mb = max(self.peak_rss_mb, self.last_rss_mb)
+
+            reason = self._recycle_reason()
+            if reason:
+                logger.info(f"Recycling browser: {reason}.")
+                self._close_browser()
+
+    def stats(self) -> dict:
+        return {
+            "launches": self.launches,
+            "urls_total": self.urls_total,
+            "urls_since_launch": self.urls_since_launch,
+            "browser_rss_mb": (
+                round(self.last_rss_mb, 1) if self.last_rss_mb is not None else None
+            ),
+            "peak_browser_rss_mb": round(self.peak_rss_mb, 1),
+        }
+
+    def close(self):
+        self._close_browser()
@@ -0,0 +1,100 @@
+import logging
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetExceededError(Exception):
+    """Raised when waiting, e.g. for the LLM rate limiter, would run past a time budget."""
+
+
+class RunBudget:
+    """
+    Wall-clock and token budgets for one URL and for each FSM state of it.
+
+    The URL clock starts when the budget is created, the state clock on every
+    `start_state`. A limit of 0 disables that budget. `exceeded` names the
+    first budget that ran out, and the first one ever hit is kept in `hit`
+    for the results row.
+    """
+
+    def __init__(
+        self,
+        url_seconds: float = config.URL_TIME_BUDGET_S,
+        url_tokens: int = config.URL_TOKEN_BUDGET,
+        state_seconds: float = config.STATE_TIME_BUDGET_S,
+        state_tokens: int = config.STATE_TOKEN_BUDGET,
+    ):
+        self.url_seconds = url_seconds
+        self.url_tokens = url_tokens
+        self.state_seconds = state_seconds
+        self.state_tokens = state_tokens
+
+        self.url_started = time.monotonic()
+        self.url_tokens_used = 0
+        self.state = ""
+        self.state_started = self.url_started
+        self.state_tokens_used = 0
+        self.hit = ""
+
+    def start_state(self, state: str):
+        self.state = state
+        self.state_started = time.monotonic()
+        self.state_tokens_used = 0
+
+    def add_tokens(self, tokens: int):
+        self.url_tokens_used += tokens
+        self.state_tokens_used += tokens
+
+    def _time_limits(self) -> list[tuple[float, str]]:
+        limits = []
+        if self.url_seconds:
+            limits.append((self.url_started + self.url_seconds, "url_time"))
+        if self.state_seconds:
+            limits.append(
+                (self.state_started + self.state_seconds, f"state_time:{self.state}")
+            )
+        return limits
+
+    def deadline(self) -> float | None:
+        """time.monotonic() value at which the first time budget runs out, None without one."""
+        limits = self._time_limits()
+        return min(limits)[0] if limits else None
+
+    def expire(self) -> str:
+        """
+        Records the time budget that ends first as hit, for callers that
+        stopped early because they would have waited past the deadline.
+        """
+        reason = self.exceeded() or min(self._time_limits())[1]
+        if not self.hit:
+            self.hit = reason
+            logger.warning(f"Budget '{reason}' would run out while waiting, stopping.")
+        return reason
+
+    def url_exceeded(self) -> str:
+        """The URL budget that ran out ("url_time" or "url_tokens"), or ""."""
+        if self.url_seconds and time.monotonic() - self.url_started > self.url_seconds:
+            return "url_time"
+        if self.url_tokens and self.url_tokens_used > self.url_tokens:
+            return "url_tokens"
+        return ""
+
+    def exceeded(self) -> str:
+        """The URL or current state budget that ran out, or ""."""
+        reason = self.url_exceeded()
+        if not reason:
+            now = time.monotonic()
+            if self.state_seconds and now - self.state_started > self.state_seconds:
+                reason = f"state_time:{self.state}"
+            elif self.state_tokens and self.state_tokens_used > self.state_tokens:
+                reason = f"state_tokens:{self.state}"
+        if reason and not self.hit:
+            self.hit = reason
+            logger.warning(
+                f"Budget '{reason}' exhausted after {time.monotonic() - self.url_started:.0f}s "
+                f"and {self.url_tokens_used} tokens."
+            )
+        return reason
@@ -0,0 +1,128 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# --- Run Settings ---
+# Every setting can be overridden from the environment (or .env) and most of
+# them again from the command line, see main.py.
+INPUT_CSV_PATH = os.getenv("VERIFY_INPUT_CSV", "input_urls.csv")
+
+# Number of URLs verified in parallel. Each worker owns its own browser.
+WORKERS = _env_int("VERIFY_WORKERS", 1)
+
+SCREENSHOT_DIR = os.getenv("VERIFY_SCREENSHOT_DIR", "screenshots")
+# png, jpeg or webp (webp needs Pillow). Quality applies to jpeg and webp.
+SCREENSHOT_FORMAT = os.getenv("VERIFY_SCREENSHOT_FORMAT", "png")
+SCREENSHOT_QUALITY = _env_int("VERIFY_SCREENSHOT_QUALITY", 80)
+
+HEADLESS = _env_bool("VERIFY_HEADLESS", True)
+PAGE_LOAD_TIMEOUT_MS = _env_int("VERIFY_PAGE_LOAD_TIMEOUT_MS", 60000)
+
+# Preflight before the browser starts: add missing schemes, drop duplicate and
+# unreachable URLs with concurrent HTTP checks that give up after the timeout.
+PREFLIGHT = _env_bool("VERIFY_PREFLIGHT", True)
+PREFLIGHT_TIMEOUT_S = _env_int("VERIFY_PREFLIGHT_TIMEOUT_S", 8)
+PREFLIGHT_CONCURRENCY = _env_int("VERIFY_PREFLIGHT_CONCURRENCY", 32)
+
+# Every URL gets a fresh browser context. The browser itself is restarted after
+# BROWSER_RECYCLE_AFTER URLs or once its processes use more than
+# BROWSER_MAX_RSS_MB of resident memory (0 disables either limit).
+BROWSER_RECYCLE_AFTER = _env_int("VERIFY_BROWSER_RECYCLE_AFTER", 50)
+BROWSER_MAX_RSS_MB = _env_int("VERIFY_BROWSER_MAX_RSS_MB", 1500)
+
+# Upper bounds for a single find_interactive_elements observation, so one scan
+# of a huge page cannot blow up the prompt.
+SCAN_MAX_ELEMENTS = _env_int("VERIFY_SCAN_MAX_ELEMENTS", 200)
+SCAN_MAX_CHARS = _env_int("VERIFY_SCAN_MAX_CHARS", 24000)
+# Ranked text windows returned per extract_full_page_text call.
+TEXT_WINDOWS_PER_PAGE = _env_int("VERIFY_TEXT_WINDOWS_PER_PAGE", 8)
+
+# Rule-based footer link matching that runs before the FOOTER_ANALYSIS state.
+# Links scoring at least the threshold are screenshotted without the LLM.
+FOOTER_PREPASS = _env_bool("VERIFY_FOOTER_PREPASS", True)
+FOOTER_MATCH_THRESHOLD = float(os.getenv("VERIFY_FOOTER_MATCH_THRESHOLD", "0.8"))
+
+# Approximate token budget for the message history sent on each LLM call
+# within one FSM state. Older tool observations are elided to stay under it.
+HISTORY_TOKEN_BUDGET = _env_int("VERIFY_HISTORY_TOKEN_BUDGET", 12000)
+
+# Gemini model, also the namespace of its entries in the LLM response cache.
+LLM_MODEL = os.getenv("VERIFY_LLM_MODEL", "gemini-2.0-flash")
+
+# Disk cache of LLM responses. "readwrite" serves hits and stores misses,
+# "replay" fails on a miss instead of calling the API, "off" disables it.
+LLM_CACHE_MODE = os.getenv("VERIFY_LLM_CACHE", "readwrite")
+LLM_CACHE_PATH = os.getenv("VERIFY_LLM_CACHE_PATH", "llm_cache.sqlite")
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv("VERIFY_LLM_CACHE_MAX_AGE_DAYS", "7"))
+LLM_CACHE_MAX_SIZE_MB = float(os.getenv("VERIFY_LLM_CACHE_MAX_SIZE_MB", "500"))
+
+# Wall-clock (seconds) and token budgets per URL and per FSM state. When one
+# runs out the agent skips ahead to the report with what it has found so far.
+# 0 disables a budget.
+URL_TIME_BUDGET_S = _env_int("VERIFY_URL_TIME_BUDGET_S", 300)
+URL_TOKEN_BUDGET = _env_int("VERIFY_URL_TOKEN_BUDGET", 400000)
+STATE_TIME_BUDGET_S = _env_int("VERIFY_STATE_TIME_BUDGET_S", 180)
+STATE_TOKEN_BUDGET = _env_int("VERIFY_STATE_TOKEN_BUDGET", 250000)
+
+# Rate limits for LLM calls, shared by all workers of a process (sharded runs
+# split them between the shards). Defaults match Gemini 2.0 Flash on the
+# first paid tier; 0 disables a limit. Throttled calls are retried up to
+# LLM_MAX_RETRIES times and lower the number of concurrent calls.
+LLM_RPM = _env_int("VERIFY_LLM_RPM", 2000)
+LLM_TPM = _env_int("VERIFY_LLM_TPM", 4000000)
+LLM_MAX_CONCURRENCY = _env_int("VERIFY_LLM_MAX_CONCURRENCY", 8)
+LLM_MAX_RETRIES = _env_int("VERIFY_LLM_MAX_RETRIES", 6)
+
+# Form navigation traces that led to a TCPA disclaimer are stored per form
+# template and replayed on later sites with the same form structure.
+FORM_REPLAY = _env_bool("VERIFY_FORM_REPLAY", True)
+FORM_TRACE_PATH = os.getenv("VERIFY_FORM_TRACE_PATH", "form_traces.sqlite")
+# Forms with fewer visible fields to fill in (buttons don't count), e.g. a lone
+# zip input, look the same across unrelated vendors and are neither recorded
+# nor replayed.
+FORM_REPLAY_MIN_FIELDS = _env_int("VERIFY_FORM_REPLAY_MIN_FIELDS", 4)
+
+# Network routing profile: abort fonts, media and tracker requests and stub
+# images. Hosts in the comma-separated allowlist are always loaded normally.
+BLOCK_RESOURCES = _env_bool("VERIFY_BLOCK_RESOURCES", True)
+BLOCK_ALLOWLIST = tuple(
+    domain.strip()
+    for domain in os.getenv("VERIFY_BLOCK_ALLOWLIST", "").split(",")
+    if domain.strip()
+)
+
+# Settling after clicks and fills: the page counts as settled once network and
+# DOM have been quiet for SETTLE_QUIET_MS, waiting at most SETTLE_TIMEOUT_MS.
+SETTLE_QUIET_MS = _env_int("VERIFY_SETTLE_QUIET_MS", 400)
+SETTLE_TIMEOUT_MS = _env_int("VERIFY_SETTLE_TIMEOUT_MS", 10000)
+# Requests in flight for longer than this (long polls, chat and analytics
+# beacons) no longer keep the network from counting as quiet.
+SETTLE_LONG_REQUEST_MS = _env_int("VERIFY_SETTLE_LONG_REQUEST_MS", 2000)
+
+# Write timing spans (page loads, LLM calls, tool calls, states) to a JSONL
+# trace next to the results CSV.
+PERF_TRACE = _env_bool("VERIFY_PERF_TRACE", True)
+
+# Multi-process mode: number of shard processes (1 disables sharding) and how
+# often a crashed or unfinished shard is restarted in resume mode.
+SHARDS = _env_int("VERIFY_SHARDS", 1)
+SHARD_RETRIES = _env_int("VERIFY_SHARD_RETRIES", 2)
+
+# In-page TCPA detector: a candidate at or above this confidence is
+# screenshotted and accepted without asking the LLM.
+TCPA_CONFIDENCE_THRESHOLD = float(os.getenv("VERIFY_TCPA_CONFIDENCE_THRESHOLD", "0.75"))
@@ -0,0 +1,163 @@
+import logging
+import re
+from dataclasses import dataclass, field
+
+import config
+from page_scripts import FOOTER_LINKS_JS
+
+logger = logging.getLogger(__name__)
+
+
+# For every footer item: the label used in the state summary, the screenshot
+# filename the prompts ask for, weighted patterns on the link text, and a
+# pattern on the href that adds a small bonus. Texts matching the optional
+# exclude pattern never count for that item.
+FOOTER_ITEMS = {
+    "privacy_policy": {
+        "label": "Privacy Policy",
+        "filename": "privacy_policy.png",
+        "text_patterns": [
+            (re.compile(r"privacy\s*(policy|notice|statement)", re.I), 0.9),
+            (re.compile(r"\bprivacy\b", re.I), 0.6),
+        ],
+        "href_pattern": re.compile(r"privacy", re.I),
+        "exclude_pattern": re.compile(
+            r"choices|do\s*not\s*sell|opt[\s-]*out|california|rights", re.I
+        ),
+    },
+    "terms": {
+        "label": "Terms of Service",
+        "filename": "terms.png",
+        "text_patterns": [
+            (
+                re.compile(
+                    r"terms\s*(of\s*(service|use)|(and|&)\s*conditions)|terms\s*&\s*privacy",
+                    re.I,
+                ),
+                0.9,
+            ),
+            (re.compile(r"\bterms\b|\bconditions\b", re.I), 0.6),
+        ],
+        "href_pattern": re.compile(r"terms|tos\b|conditions", re.I),
+    },
+    "do_not_sell": {
+        "label": "Do Not Sell",
+        "filename": "do_not_sell.png",
+        "text_patterns": [
+            (re.compile(r"do\s*not\s*sell|don'?t\s*sell", re.I), 0.9),
+            (re.compile(r"\bdmca\b", re.I), 0.9),
+            (re.compile(r"privacy\s*choices|opt[\s-]*out", re.I), 0.5),
+        ],
+        "href_pattern": re.compile(r"do-?not-?sell|\bdns\b|ccpa|dmca|opt-?out", re.I),
+    },
+}
+
+HREF_BONUS = 0.1
+IN_FOOTER_BONUS = 0.1
+HIDDEN_PENALTY = 0.4
+
+
+@dataclass
+class FooterMatch:
+    item: str
+    selector: str
+    text: str
+    href: str
+    score: float
+    screenshot: str = ""
+
+
+@dataclass
+class FooterScan:
+    found: dict[str, FooterMatch] = field(default_factory=dict)
+    unresolved: list[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        parts = []
+        for item, match in self.found.items():
+            parts.append(
+                f"{FOOTER_ITEMS[item]['label']}: Found (rule-based, confidence {match.score:.2f})"
+            )
+        return ", ".join(parts)
+
+
+def score_link(item: str, link: dict) -> float:
+    """Scores how likely a footer link is to be the given compliance item."""
+    spec = FOOTER_ITEMS[item]
+    if "exclude_pattern" in spec and spec["exclude_pattern"].search(link["text"]):
+        return 0.0
+    text_score = max(
+        (
+            weight
+            for pattern, weight in spec["text_patterns"]
+            if pattern.search(link["text"])
+        ),
+        default=0.0,
+    )
+    if not text_score:
+        return 0.0
+
+    score = text_score
+    if spec["href_pattern"].search(link["href"]):
+        score += HREF_BONUS
+    if link["inFooter"]:
+        score += IN_FOOTER_BONUS
+    if not link["visible"]:
+        score -= HIDDEN_PENALTY
+    return round(min(score, 1.0), 2)
+
+
+def resolve_footer_links(
+    tool_manager, threshold: float = config.FOOTER_MATCH_THRESHOLD
+) -> FooterScan:
+    """
+    Rule-based pre-pass for FOOTER_ANALYSIS. Finds the footer links that can be
+    matched with confidence, screenshots them with the regular screenshot tool
+    and leaves everything else to the LLM.
+    """
+    scan = FooterScan()
+    try:
+        links = tool_manager.page.evaluate(FOOTER_LINKS_JS, {"bottomFraction": 0.25})
+    except Exception as e:
+        logger.warning(f"Footer pre-pass could not read the page: {e}")
+        scan.unresolved = list(FOOTER_ITEMS)
+        return scan
+
+    screenshot_tool = tool_manager.get_tool("screenshot_element")
+
+    for item, spec in FOOTER_ITEMS.items():
+        scored = sorted(
+            ((score_link(item, link), link) for link in links),
+            key=lambda pair: pair[0],
+            reverse=True,
+        )
+        if not scored or scored[0][0] < threshold:
+            best = scored[0][0] if scored else 0.0
+            logger.info(f"Footer pre-pass: '{item}' unresolved (best score {best}).")
+            scan.unresolved.append(item)
+            continue
+
+        score, link = scored[0]
+        observation = screenshot_tool.invoke(
+            {"selector": link["selector"], "filename": spec["filename"]}
+        )
+        if str(observation).startswith("Error"):
+            logger.info(
+                f"Footer pre-pass: '{item}' matched but screenshot failed: {observation}"
+            )
+            scan.unresolved.append(item)
+            continue
+
+        scan.found[item] = FooterMatch(
+            item=item,
+            selector=link["selector"],
+            text=link["text"],
+            href=link["href"],
+            score=score,
+            screenshot=spec["filename"],
+        )
+        logger.info(
+            f"Footer pre-pass: '{item}' -> '{link['text']}' ({link['selector']}) score {score}"
+        )
+
+    return scan
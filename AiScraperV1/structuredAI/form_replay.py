@@ -0,0 +1,190 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+import config
+from page_scripts import FORM_FINGERPRINT_JS
+from tcpa_detector import MIN_TEXT_SCORE, tcpa_text_score
+
+logger = logging.getLogger(__name__)
+
+# Tool calls of the FORM_NAVIGATION state that are recorded and replayed.
+REPLAYABLE_TOOLS = {"click", "fill", "form_actions", "screenshot_element"}
+
+
+def form_fingerprint(page, min_fields: int = 0) -> str:
+    """
+    Hash of the page's form structure, empty if it has no form fields or
+    fewer than `min_fields` visible fields to fill in.
+    """
+    try:
+        form = page.evaluate(FORM_FINGERPRINT_JS)
+    except Exception as e:
+        logger.warning(f"Could not fingerprint the form: {e}")
+        return ""
+    if not form["structure"] or form["visibleFields"] < min_fields:
+        return ""
+    return hashlib.sha256(form["structure"].encode("utf-8")).hexdigest()
+
+
+def _is_tcpa_screenshot(step: "TraceStep") -> bool:
+    return (
+        step.tool == "screenshot_element"
+        and step.args.get("filename") == "tcpa_disclaimer.png"
+    )
+
+
+def _has_tcpa_text(page, selector: str) -> bool:
+    """True if the element's text matches TCPA_PATTERNS like a detector candidate's."""
+    try:
+        text = page.locator(selector).first.inner_text(timeout=2000)
+    except Exception as e:
+        logger.warning(f"Could not read the replayed disclaimer '{selector}': {e}")
+        return False
+    return tcpa_text_score(text) >= MIN_TEXT_SCORE
+
+
+def _succeeded(observation) -> bool:
+    # Failed tools answer with "Error...", a failed form_actions batch with "Stopped...".
+    return not str(observation).startswith(("Error", "Stopped"))
+
+
+@dataclass
+class TraceStep:
+    # Form fingerprint the page had right before the step.
+    fingerprint: str
+    tool: str
+    args: dict
+
+
+@dataclass
+class ReplayResult:
+    steps_run: int = 0
+    completed: bool = False
+    # The trace ended with the TCPA disclaimer screenshot, the element's text
+    # matched the TCPA patterns and the screenshot succeeded.
+    tcpa_screenshot: bool = False
+    reason: str = ""
+
+
+class FormTraceStore:
+    """
+    SQLite store of successful form navigation traces, keyed by the form
+    fingerprint of the first form page. Safe to share between worker threads.
+    """
+
+    def __init__(self, path: str = config.FORM_TRACE_PATH):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS traces ("
+            "fingerprint TEXT PRIMARY KEY, created_at REAL, last_used REAL, uses INTEGER, steps TEXT)"
+        )
+        self._conn.commit()
+
+    def get(self, fingerprint: str) -> list[TraceStep] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT steps FROM traces WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE traces SET last_used = ?, uses = uses + 1 WHERE fingerprint = ?",
+                (time.time(), fingerprint),
+            )
+            self._conn.commit()
+        return [TraceStep(**step) for step in json.loads(row[0])]
+
+    def put(self, fingerprint: str, steps: list[TraceStep]):
+        payload = json.dumps([asdict(step) for step in steps])
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO traces VALUES (?, ?, ?, 0, ?) "
+                "ON CONFLICT(fingerprint) DO UPDATE SET steps = excluded.steps, last_used = excluded.last_used",
+                (fingerprint, now, now, payload),
+            )
+            self._conn.commit()
+
+    def close(self):
+        logger.info(
+            f"Form trace store closed: {self.hits} replayable, {self.misses} new form(s)."
+        )
+        self._conn.close()
+
+
+class FormTraceRecorder:
+    """
+    Records the replayable tool calls of one FORM_NAVIGATION state and replays
+    a stored trace. Every replayed step first checks that the page still has
+    the form fingerprint recorded for it and stops at the first divergence.
+    A replayed TCPA screenshot is only taken if the element's text still
+    matches the TCPA patterns. Forms with fewer than `min_fields`
+    fields get no key and are neither replayed nor saved.
+    """
+
+    def __init__(
+        self,
+        tool_manager,
+        store: FormTraceStore,
+        min_fields: int = config.FORM_REPLAY_MIN_FIELDS,
+    ):
+        self.tool_manager = tool_manager
+        self.store = store
+        self.key = form_fingerprint(tool_manager.page, min_fields)
+        self.steps: list[TraceStep] = []
+
+    def fingerprint(self) -> str:
+        return form_fingerprint(self.tool_manager.page)
+
+    def record(self, fingerprint: str, tool: str, args: dict, observation):
+        if tool in REPLAYABLE_TOOLS and _succeeded(observation):
+            self.steps.append(TraceStep(fingerprint, tool, dict(args)))
+
+    def replay(self) -> ReplayResult:
+        result = ReplayResult()
+        trace = self.store.get(self.key) if self.key else None
+        if not trace:
+            result.reason = "no recorded trace"
+            return result
+
+        for step in trace:
+            current = self.fingerprint()
+            if current != step.fingerprint:
+                result.reason = f"form diverged before step {result.steps_run + 1}"
+                break
+            if _is_tcpa_screenshot(step) and not _has_tcpa_text(
+                self.tool_manager.page, step.args.get("selector", "")
+            ):
+                result.reason = f"step {result.steps_run + 1} is not a TCPA disclaimer"
+                break
+            observation = self.tool_manager.get_tool(step.tool).invoke(step.args)
+            logger.info(f"Replayed {step.tool} {step.args}: {observation}")
+            if not _succeeded(observation):
+                result.reason = f"step {result.steps_run + 1} failed: {observation}"
+                break
+            self.steps.append(step)
+            result.steps_run += 1
+        else:
+            result.completed = True
+            result.tcpa_screenshot = _is_tcpa_screenshot(trace[-1])
+
+        logger.info(
+            f"Form replay: {result.steps_run} of {len(trace)} step(s)"
+            + (f", {result.reason}." if result.reason else ", completed.")
+        )
+        return result
+
+    def save(self):
+        """Stores the trace of this run, called once it led to the TCPA disclaimer."""
+        if self.key and self.steps:
+            self.store.put(self.key, self.steps)
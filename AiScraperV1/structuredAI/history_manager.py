@@ -0,0 +1,121 @@
+import logging
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Tools whose output describes the whole current page, by the kind of snapshot.
+# Only the most recent snapshot of each kind is still accurate, older ones are
+# replaced by a stub. form_actions ends its observation with an element scan.
+# Text results are paged, each page is a kind of its own, see snapshot_kind.
+SNAPSHOT_TOOLS = {
+    "find_interactive_elements": "elements",
+    "form_actions": "elements",
+    "extract_full_page_text": "text",
+}
+
+# Element scans in diff mode start with this header. They only list changes
+# against the previous scan, so they never supersede a full snapshot.
+SCAN_DIFF_HEADER = "Changes since the previous scan"
+
+# Stale observations that still don't fit the budget are cut to this many chars.
+STALE_OBSERVATION_CHARS = 300
+
+
+def snapshot_kind(name: str, args: dict) -> str | None:
+    """The snapshot kind of a tool call, None if its result is not a page snapshot."""
+    kind = SNAPSHOT_TOOLS.get(name)
+    if kind == "text":
+        # Moving on to page 2 must not elide page 1, it holds the best windows.
+        kind += f":{args.get('page_number') or 1}"
+    return kind
+
+
+def estimate_tokens(messages: list[BaseMessage]) -> int:
+    """Rough token count (about four characters per token) of a message list."""
+    chars = 0
+    for message in messages:
+        chars += len(str(message.content))
+        if isinstance(message, AIMessage):
+            chars += sum(len(str(call["args"])) for call in message.tool_calls)
+    return chars // 4
+
+
+class MessageHistory:
+    """
+    The message history of one FSM state.
+
+    The full history is kept in `messages`. `for_invoke` returns a compacted
+    copy that fits the token budget: superseded page snapshots are elided first,
+    then the oldest tool observations are truncated. Every tool call keeps its
+    ToolMessage, so the history stays valid for the model.
+    """
+
+    def __init__(self, prompt: str, token_budget: int = config.HISTORY_TOKEN_BUDGET):
+        self.messages: list[BaseMessage] = [HumanMessage(content=prompt)]
+        self.token_budget = token_budget
+        self._tool_names: dict[str, str] = {}
+        self._snapshot_kinds: dict[str, str | None] = {}
+
+    def append(self, message: BaseMessage):
+        if isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                self._tool_names[call["id"]] = call["name"]
+                self._snapshot_kinds[call["id"]] = snapshot_kind(
+                    call["name"], call.get("args") or {}
+                )
+        self.messages.append(message)
+
+    def for_invoke(self) -> list[BaseMessage]:
+        compacted = list(self.messages)
+        tool_indexes = [
+            i for i, m in enumerate(compacted) if isinstance(m, ToolMessage)
+        ]
+
+        # 1. Keep only the latest snapshot of each kind, plus the diffs after it.
+        latest_snapshot: dict[str, list[int]] = {}
+        for i in tool_indexes:
+            name = self._tool_names.get(compacted[i].tool_call_id)
+            kind = self._snapshot_kinds.get(compacted[i].tool_call_id)
+            if not kind:
+                continue
+            if SCAN_DIFF_HEADER in str(compacted[i].content):
+                latest_snapshot.setdefault(kind, []).append(i)
+                continue
+            for old in latest_snapshot.get(kind, []):
+                compacted[old] = self._replace_content(
+                    compacted[old],
+                    f"[Elided: superseded by a later {name} result.]",
+                )
+            latest_snapshot[kind] = [i]
+
+        # 2. Truncate the oldest observations until the history fits the budget.
+        #    The latest observation and the current page snapshots are kept whole.
+        protected = {i for indexes in latest_snapshot.values() for i in indexes}
+        protected |= set(tool_indexes[-1:])
+        tokens = estimate_tokens(compacted)
+        for i in tool_indexes:
+            if tokens <= self.token_budget:
+                break
+            if i in protected:
+                continue
+            content = str(compacted[i].content)
+            if len(content) <= STALE_OBSERVATION_CHARS:
+                continue
+            compacted[i] = self._replace_content(
+                compacted[i],
+                content[:STALE_OBSERVATION_CHARS]
+                + f"... [truncated {len(content) - STALE_OBSERVATION_CHARS} chars]",
+            )
+            tokens = estimate_tokens(compacted)
+
+        if tokens > self.token_budget:
+            logger.warning(
+                f"Message history is ~{tokens} tokens after compaction, over the budget of {self.token_budget}."
+            )
+        return compacted
+
+    @staticmethod
+    def _replace_content(message: BaseMessage, content: str) -> BaseMessage:
+        return message.model_copy(update={"content": content})
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    message_to_dict,
+    messages_from_dict,
+)
+from playwright.sync_api import Page
+
+import config
+from page_scripts import PAGE_FINGERPRINT_JS
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("off", "readwrite", "replay")
+
+
+class CacheMissError(Exception):
+    """Raised in replay mode when a response is not in the cache."""
+
+
+class ReplayOnlyLLM:
+    """
+    Stands in for the chat model in replay mode, so an offline run needs no
+    API key. Every call that reaches it is a cache miss.
+    """
+
+    def __init__(self, model: str = config.LLM_MODEL):
+        self.model = model
+
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages):
+        raise CacheMissError(
+            f"Replay mode: no cached response and no '{self.model}' client."
+        )
+
+
+def page_fingerprint(page: Page) -> str:
+    """Hash of the structural DOM of the page, empty if the page can't be read."""
+    try:
+        structure = page.evaluate(PAGE_FINGERPRINT_JS, {"maxElements": 5000})
+    except Exception as e:
+        logger.warning(f"Could not fingerprint page: {e}")
+        return ""
+    return hashlib.sha256(structure.encode("utf-8")).hexdigest()
+
+
+def normalize_messages(messages: list[BaseMessage]) -> list:
+    """
+    Reduces messages to what the model actually sees. Tool call ids are left
+    out because they are random per run and would make every key unique.
+    """
+    normalized = []
+    for message in messages:
+        entry = [message.type, str(message.content)]
+        if isinstance(message, AIMessage) and message.tool_calls:
+            entry.append([[call["name"], call["args"]] for call in message.tool_calls])
+        normalized.append(entry)
+    return normalized
+
+
+class LLMResponseCache:
+    """
+    Disk-backed (SQLite) cache of LLM responses for run_fsm_agent.
+
+    The key combines a namespace (usually the model name), the FSM state, the
+    normalized message history and the page fingerprint. Entries older than
+    `max_age_days` are ignored and purged; when the cache grows past
+    `max_size_mb` the least recently used entries are evicted.
+
+    In "replay" mode the cache never calls the model and raises CacheMissError
+    on a miss, which makes regression runs deterministic and offline.
+    """
+
+    def __init__(
+        self,
+        path: str = config.LLM_CACHE_PATH,
+        mode: str = config.LLM_CACHE_MODE,
+        max_age_days: float = config.LLM_CACHE_MAX_AGE_DAYS,
+        max_size_mb: float = config.LLM_CACHE_MAX_SIZE_MB,
+        namespace: str = "",
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(
+                f"Unknown LLM cache mode '{mode}', use one of {CACHE_MODES}."
+            )
+        self.mode = mode
+        self.max_age_seconds = max_age_days * 86400
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, created_at REAL, last_access REAL, size INTEGER, payload TEXT)"
+        )
+        self._conn.commit()
+
+    def make_key(
+        self, state: str, messages: list[BaseMessage], fingerprint: str
+    ) -> str:
+        raw = json.dumps(
+            [self.namespace, state, fingerprint, normalize_messages(messages)],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def invoke(
+        self, runnable, messages: list[BaseMessage], state: str, fingerprint: str
+    ):
+        """Returns the cached response for this call, invoking `runnable` on a miss."""
+        key = self.make_key(state, messages, fingerprint)
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            logger.info(f"LLM cache hit for state '{state}' ({key[:12]}).")
+            return cached
+
+        self.misses += 1
+        if self.mode == "replay":
+            raise CacheMissError(
+                f"No cached LLM response for state '{state}' (key {key[:12]})."
+            )
+
+        response = runnable.invoke(messages)
+        self.put(key, response)
+        return response
+
+    def get(self, key: str) -> AIMessage | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, payload FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            created_at, payload = row
+            if now - created_at > self.max_age_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        message = messages_from_dict([json.loads(payload)])[0]
+        message.response_metadata["cache_hit"] = True
+        return message
+
+    def put(self, key: str, message: BaseMessage):
+        payload = json.dumps(message_to_dict(message))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, now, now, len(payload), payload),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.max_age_seconds,)
+        )
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_size_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        logger.info(f"LLM cache evicted {len(evicted)} least recently used entries.")
+
+    def close(self):
+        logger.info(f"LLM cache closed: {self.hits} hits, {self.misses} misses.")
+        self._conn.close()
@@ -1,35 +1,55 @@
+import argparse
 import logging
 import os
 import sys
 import csv
 import re
+from functools import partial
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import BrowserContext
 from langchain_google_genai import ChatGoogleGenerativeAI
 from datetime import datetime
 
+import config
 from agent_runner import run_fsm_agent
+from budgets import RunBudget
+from form_replay import FormTraceStore
+from llm_cache import CACHE_MODES, LLMResponseCache, ReplayOnlyLLM
+from perf_trace import PerfTracer
+from preflight import PreflightResult, run_preflight
+from rate_limiter import LLMRateLimiter
+from results_writer import ResultWriter, load_completed_rows, load_completed_urls
+from screenshot_store import ScreenshotStore, url_namespace
+from sharding import ShardedRun
 from tool_manager import ToolManager
-from tools import CustomClickTool
+from trace_store import TraceStore
+from tools import CustomClickTool, FormActionsTool
+from worker_pool import BrowserWorkerPool
 
 CustomClickTool.model_rebuild()
+FormActionsTool.model_rebuild()
 
 load_dotenv()
 logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    level=logging.INFO,
+    format="%(asctime)s - %(threadName)s - %(levelname)s - %(message)s",
 )
 logger = logging.getLogger(__name__)
 
+
 # --- LLM Setup ---
-try:
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash",
-        temperature=0.1,
-        google_api_key=os.getenv("GOOGLE_API_KEY"),
-    )
-except Exception as e:
-    logger.error(f"Failed to initialize Google Gemini LLM: {e}")
-    sys.exit(1)
+def create_llm():
+    try:
+        return ChatGoogleGenerativeAI(
+            model=config.LLM_MODEL,
+            temperature=0.1,
+            # Throttling is retried by the shared LLMRateLimiter instead.
+            max_retries=1,
+            google_api_key=os.getenv("GOOGLE_API_KEY"),
+        )
+    except Exception as e:
+        logger.error(f"Failed to initialize Google Gemini LLM: {e}")
+        sys.exit(1)
 
 
 # --- Verification Results Structure ---
@@ -41,8 +61,11 @@ class VerificationResults:
         self.dmca_found = False
         self.disclaimer_found = False
         self.form_filled = False
+        self.screenshot_paths = ""
+        self.budget_hit = ""
         self.raw_output_summary = "No summary provided."
-        self.agent_thoughts = "No detailed thoughts recorded."
+        # '<trace store>#<trace id>' of the agent's message history.
+        self.trace_ref = ""
 
     def to_dict(self):
         return {
@@ -52,20 +75,22 @@ class VerificationResults:
             "dmca_found": self.dmca_found,
             "disclaimer_found": self.disclaimer_found,
             "form_filled": self.form_filled,
+            "screenshot_paths": self.screenshot_paths,
+            "budget_hit": self.budget_hit,
             "raw_output_summary": self.raw_output_summary,
-            "agent_thoughts": self.agent_thoughts,
+            "trace_ref": self.trace_ref,
         }
 
 
 def parse_agent_output_to_results(
-    agent_output: str, agent_thoughts: str
+    agent_output: str, trace_ref: str = ""
 ) -> VerificationResults:
     """
     Parses the agent's final structured report into a VerificationResults object.
     """
     results = VerificationResults()
     results.raw_output_summary = agent_output
-    results.agent_thoughts = agent_thoughts
+    results.trace_ref = trace_ref
 
     output_lower = agent_output.lower()
 
@@ -91,11 +116,134 @@ def parse_agent_output_to_results(
 
 
 # --- Main Execution Block ---
-def main_run():
-    input_csv_path = "input_urls.csv"
-    output_csv_path = (
-        f"verification_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    )
+def verify_url(
+    context: BrowserContext,
+    url: str,
+    llm,
+    llm_cache: LLMResponseCache | None = None,
+    tracer: PerfTracer | None = None,
+    screenshot_store: ScreenshotStore | None = None,
+    form_traces: FormTraceStore | None = None,
+    rate_limiter: LLMRateLimiter | None = None,
+    trace_store: TraceStore | None = None,
+) -> dict:
+    """
+    Runs the full FSM verification for a single URL in its own page of the
+    given context and returns the row for the results CSV.
+    """
+    tracer = tracer or PerfTracer()
+    with tracer.url_scope(url):
+        return _verify_url(
+            context,
+            url,
+            llm,
+            llm_cache,
+            tracer,
+            screenshot_store,
+            form_traces,
+            rate_limiter,
+            trace_store,
+        )
+
+
+def _verify_url(
+    context: BrowserContext,
+    url: str,
+    llm,
+    llm_cache: LLMResponseCache | None,
+    tracer: PerfTracer,
+    screenshot_store: ScreenshotStore | None,
+    form_traces: FormTraceStore | None,
+    rate_limiter: LLMRateLimiter | None,
+    trace_store: TraceStore | None,
+) -> dict:
+    logger.info(f"\n{'='*70}\nProcessing URL: {url}\n{'='*70}")
+    page = None
+    # Started before the page load, so it counts against the URL budget.
+    budget = RunBudget()
+    trace_ref, trace_sink = "", None
+    if trace_store:
+        trace_id = trace_store.begin(url)
+        trace_ref = trace_store.reference(trace_id)
+        trace_sink = partial(trace_store.append, trace_id)
+    try:
+        page = context.new_page()
+        with tracer.span("goto"):
+            page.goto(url, timeout=config.PAGE_LOAD_TIMEOUT_MS)
+
+        tool_manager = ToolManager(
+            context.browser,
+            context,
+            page,
+            screenshot_store=screenshot_store,
+            screenshot_namespace=url_namespace(url),
+        )
+        for tool in tool_manager.tools:
+            if hasattr(tool, "manager"):
+                tool.manager = tool_manager
+
+        final_output_str, _ = run_fsm_agent(
+            llm,
+            tool_manager,
+            llm_cache=llm_cache,
+            tracer=tracer,
+            form_traces=form_traces,
+            rate_limiter=rate_limiter,
+            budget=budget,
+            trace_sink=trace_sink,
+        )
+
+        if not isinstance(final_output_str, str):
+            final_output_str = str(final_output_str)
+
+        parsed_results = parse_agent_output_to_results(final_output_str, trace_ref)
+        parsed_results.url = url
+        parsed_results.screenshot_paths = "; ".join(tool_manager.screenshot_paths)
+        parsed_results.budget_hit = budget.hit
+        return parsed_results.to_dict()
+
+    except Exception as e:
+        logger.error(f"Failed to process URL {url}: {e}", exc_info=True)
+        return {
+            "url": url,
+            "raw_output_summary": f"CRITICAL_FAILURE: {e}",
+            "trace_ref": trace_ref,
+        }
+    finally:
+        if page:
+            page.close()
+
+
+def preflight_skipped_row(check: PreflightResult) -> dict:
+    return {
+        "url": check.url,
+        "raw_output_summary": f"PREFLIGHT_SKIPPED: {check.reason}",
+    }
+
+
+def main_run(
+    workers: int = config.WORKERS,
+    llm_cache_mode: str = config.LLM_CACHE_MODE,
+    output_csv_path: str | None = None,
+    resume: bool = False,
+    block_resources: bool = config.BLOCK_RESOURCES,
+    input_csv_path: str = config.INPUT_CSV_PATH,
+    llm=None,
+    screenshot_dir: str = config.SCREENSHOT_DIR,
+    shards: int = 1,
+    headless: bool = config.HEADLESS,
+    quota_share: float = 1.0,
+    preflight: bool = config.PREFLIGHT,
+) -> dict | None:
+    """
+    Verifies every URL of the input CSV and writes the results CSV. Uses
+    Gemini unless another chat model is passed in. Returns the performance
+    summary of the run, or None when the run was split into shard processes.
+    """
+    if output_csv_path is None:
+        output_csv_path = (
+            f"verification_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        )
 
     urls_to_test = []
     try:
@@ -113,73 +261,213 @@ def main_run():
         logger.error(f"Input CSV file not found: '{input_csv_path}'.")
         sys.exit(1)
 
-    all_results = []
-
-    with sync_playwright() as p:
-        browser = None
-        try:
-            browser = p.chromium.launch(headless=False, timeout=60000)
-            context = browser.new_context()
-
-            for url in urls_to_test:
-                logger.info(f"\n{'='*70}\nProcessing URL: {url}\n{'='*70}")
-                page = None
-                try:
-                    page = context.new_page()
-                    page.goto(url, timeout=60000)
-
-                    tool_manager = ToolManager(browser, context, page)
-                    for tool in tool_manager.tools:
-                        if hasattr(tool, "manager"):
-                            tool.manager = tool_manager
-
-                    final_output_str, agent_thoughts_str = run_fsm_agent(
-                        llm, tool_manager
-                    )
-
-                    if not isinstance(final_output_str, str):
-                        final_output_str = str(final_output_str)
-
-                    parsed_results = parse_agent_output_to_results(
-                        final_output_str, agent_thoughts_str
-                    )
-                    parsed_results.url = url
-                    all_results.append(parsed_results.to_dict())
-
-                except Exception as e:
-                    logger.error(f"Failed to process URL {url}: {e}", exc_info=True)
-                    all_results.append(
-                        {"url": url, "raw_output_summary": f"CRITICAL_FAILURE: {e}"}
-                    )
-                finally:
-                    if page:
-                        page.close()
-
-        except Exception as e:
-            logger.error(
-                f"A critical error occurred during the browser session: {e}",
-                exc_info=True,
+    fieldnames = list(VerificationResults().to_dict().keys())
+
+    if shards > 1:
+        targets, skipped = list(urls_to_test), {}
+        if resume:
+            # URLs finished in the output itself, e.g. by an earlier unsharded run.
+            completed = load_completed_rows(output_csv_path)
+            for index, url in enumerate(urls_to_test):
+                if url in completed:
+                    skipped[index] = completed[url]
+            logger.info(
+                f"Resuming '{output_csv_path}': {len(skipped)} URL(s) already done."
             )
-        finally:
-            if browser:
-                browser.close()
-                logger.info("Browser closed.")
-
-    if all_results:
-        fieldnames = list(VerificationResults().to_dict().keys())
-        try:
-            with open(
-                output_csv_path, mode="w", newline="", encoding="utf-8"
-            ) as outfile:
-                writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(all_results)
-            logger.info(f"Verification results saved to '{output_csv_path}'.")
-        except Exception as e:
-            logger.error(f"Error writing output CSV: {e}", exc_info=True)
-    else:
-        logger.warning("No results were generated to write to CSV.")
+        # Preflight once over the whole input, so duplicates that would land
+        # in different shards are caught as well.
+        if preflight:
+            pending = [i for i in range(len(urls_to_test)) if i not in skipped]
+            checks = run_preflight([urls_to_test[i] for i in pending])
+            for index, check in zip(pending, checks):
+                if check.reason:
+                    skipped[index] = preflight_skipped_row(check)
+                else:
+                    targets[index] = check.target
+        sharded_run = ShardedRun(
+            shards,
+            shard_dir=os.path.splitext(output_csv_path)[0] + "_shards",
+            screenshot_dir=screenshot_dir,
+            max_retries=config.SHARD_RETRIES,
+            run_kwargs={
+                "workers": workers,
+                "llm_cache_mode": llm_cache_mode,
+                "block_resources": block_resources,
+                "headless": headless,
+                # Every shard process gets its part of the LLM rate limits.
+                "quota_share": quota_share / shards,
+                "preflight": False,
+            },
+        )
+        sharded_run.run(
+            urls_to_test,
+            output_csv_path,
+            fieldnames,
+            resume=resume,
+            targets=targets,
+            skipped=skipped,
+        )
+        return None
+
+    input_urls = list(urls_to_test)
+    if resume:
+        completed = load_completed_urls(output_csv_path)
+        urls_to_test = [url for url in urls_to_test if url not in completed]
+        logger.info(
+            f"Resuming '{output_csv_path}': {len(completed)} URL(s) already done, "
+            f"{len(urls_to_test)} left."
+        )
+        if not urls_to_test:
+            return
+
+    if llm is None:
+        # Replay runs are served from the cache alone and work without an API key.
+        llm = ReplayOnlyLLM() if llm_cache_mode == "replay" else create_llm()
+
+    llm_cache = None
+    if llm_cache_mode != "off":
+        llm_cache = LLMResponseCache(
+            mode=llm_cache_mode, namespace=getattr(llm, "model", type(llm).__name__)
+        )
+
+    tracer = PerfTracer(
+        os.path.splitext(output_csv_path)[0] + ".trace.jsonl"
+        if config.PERF_TRACE
+        else None
+    )
+
+    try:
+        result_writer = ResultWriter(
+            output_csv_path, fieldnames, input_urls, append=resume
+        )
+    except OSError as e:
+        logger.error(f"Error opening output CSV: {e}", exc_info=True)
+        sys.exit(1)
+
+    # Input indexes of the URLs that go to the browser, and what to load for them.
+    live_indexes = list(range(len(urls_to_test)))
+    targets = list(urls_to_test)
+    if preflight:
+        with tracer.span("preflight"):
+            checks = run_preflight(urls_to_test)
+        live_indexes, targets = [], []
+        for index, check in enumerate(checks):
+            if check.reason:
+                result_writer.submit(preflight_skipped_row(check))
+            else:
+                live_indexes.append(index)
+                targets.append(check.target)
+
+    def submit_result(live_index: int, row: dict):
+        index = live_indexes[live_index]
+        # Keep the input spelling of the URL, --resume matches on it.
+        row["url"] = urls_to_test[index]
+        result_writer.submit(row)
+
+    screenshot_store = ScreenshotStore(screenshot_dir)
+    form_traces = FormTraceStore() if config.FORM_REPLAY else None
+    trace_store = TraceStore(os.path.splitext(output_csv_path)[0] + ".traces.sqlite")
+    rate_limiter = LLMRateLimiter(
+        rpm=int(config.LLM_RPM * quota_share), tpm=int(config.LLM_TPM * quota_share)
+    )
+
+    pool = BrowserWorkerPool(
+        partial(
+            verify_url,
+            llm=llm,
+            llm_cache=llm_cache,
+            tracer=tracer,
+            screenshot_store=screenshot_store,
+            form_traces=form_traces,
+            rate_limiter=rate_limiter,
+            trace_store=trace_store,
+        ),
+        workers=workers,
+        headless=headless,
+        launch_timeout=config.PAGE_LOAD_TIMEOUT_MS,
+        block_resources=block_resources,
+    )
+    try:
+        pool.run(targets, submit_result)
+    finally:
+        screenshot_store.close()
+        if form_traces:
+            form_traces.close()
+        logger.info(f"LLM rate limiter: {rate_limiter.stats()}")
+        trace_store.close()
+        result_writer.close()
+        if llm_cache:
+            llm_cache.close()
+        tracer.log_summary()
+        tracer.close()
+    logger.info(f"Verification results saved to '{output_csv_path}'.")
+    return tracer.summary()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Verify compliance links and TCPA disclaimers for a list of URLs."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=config.WORKERS,
+        help="Number of URLs to verify concurrently, each with its own browser.",
+    )
+    parser.add_argument(
+        "--llm-cache",
+        choices=CACHE_MODES,
+        default=config.LLM_CACHE_MODE,
+        help="LLM response cache mode. 'replay' fails on a cache miss instead of calling the API.",
+    )
+    parser.add_argument(
+        "--output",
+        help="Results CSV to write. Defaults to a new timestamped file.",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="RESULTS_CSV",
+        help="Continue an interrupted run: append to this results CSV and skip URLs it already contains.",
+    )
+    parser.add_argument(
+        "--no-block-resources",
+        dest="block_resources",
+        action="store_false",
+        default=config.BLOCK_RESOURCES,
+        help="Load images, fonts, media and trackers instead of blocking them.",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=config.SHARDS,
+        help="Split the input across this many processes, each with its own browser(s).",
+    )
+    parser.add_argument(
+        "--no-preflight",
+        dest="preflight",
+        action="store_false",
+        default=config.PREFLIGHT,
+        help="Send every input URL to the browser without the HTTP preflight checks.",
+    )
+    parser.add_argument(
+        "--headed",
+        dest="headless",
+        action="store_false",
+        default=config.HEADLESS,
+        help="Show the browser windows instead of running headless.",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    main_run()
+    args = parse_args()
+    main_run(
+        workers=args.workers,
+        llm_cache_mode=args.llm_cache,
+        output_csv_path=args.resume or args.output,
+        resume=bool(args.resume),
+        block_resources=args.block_resources,
+        shards=args.shards,
+        headless=args.headless,
+        preflight=args.preflight,
+    )
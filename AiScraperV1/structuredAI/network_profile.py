@@ -0,0 +1,129 @@
+import base64
+import logging
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+from playwright.sync_api import BrowserContext, Response, Route
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Resource types that compliance checks never need.
+BLOCKED_RESOURCE_TYPES = {"media", "font"}
+# Resource types answered with a tiny placeholder instead of being aborted, so
+# pages that wait on them still finish loading.
+STUBBED_RESOURCE_TYPES = {"image"}
+
+TRACKER_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "facebook.net",
+    "connect.facebook.com",
+    "bat.bing.com",
+    "clarity.ms",
+    "hotjar.com",
+    "fullstory.com",
+    "mixpanel.com",
+    "segment.io",
+    "segment.com",
+    "newrelic.com",
+    "nr-data.net",
+    "quantserve.com",
+    "scorecardresearch.com",
+    "taboola.com",
+    "outbrain.com",
+    "criteo.com",
+    "adnxs.com",
+    "adsrvr.org",
+    "amazon-adsystem.com",
+    "analytics.tiktok.com",
+    "ct.pinterest.com",
+    "px.ads.linkedin.com",
+    "sc-static.net",
+)
+
+# Consent-capture vendors render or certify TCPA disclaimers on lead forms,
+# they must keep working even though they look like third-party trackers.
+DEFAULT_ALLOWLIST = (
+    "trustedform.com",
+    "activeprospect.com",
+    "leadid.com",
+    "jornaya.com",
+)
+
+# 1x1 transparent GIF.
+_STUB_IMAGE = base64.b64decode(
+    "R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
+)
+
+
+def _matches(host: str, domains) -> bool:
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+class NetworkBlocker:
+    """
+    Routing profile for a browser context that aborts fonts and media, stubs
+    images and aborts requests to known analytics and ad domains. Hosts on the
+    allowlist are never touched. Keeps counts of what was blocked and how many
+    bytes the allowed responses declared.
+    """
+
+    def __init__(self, allowlist=config.BLOCK_ALLOWLIST):
+        self.allowlist = tuple(DEFAULT_ALLOWLIST) + tuple(allowlist)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def attach(self, context: BrowserContext):
+        context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+
+    def _handle(self, route: Route):
+        request = route.request
+        host = urlsplit(request.url).hostname or ""
+        resource_type = request.resource_type
+
+        if _matches(host, self.allowlist):
+            route.continue_()
+        elif _matches(host, TRACKER_DOMAINS):
+            self._count("tracker", resource_type)
+            route.abort("blockedbyclient")
+        elif resource_type in BLOCKED_RESOURCE_TYPES:
+            self._count("resource", resource_type)
+            route.abort("blockedbyclient")
+        elif resource_type in STUBBED_RESOURCE_TYPES:
+            self._count("stubbed", resource_type)
+            route.fulfill(status=200, content_type="image/gif", body=_STUB_IMAGE)
+        else:
+            route.continue_()
+
+    def _count(self, reason: str, resource_type: str):
+        with self._lock:
+            self._blocked[f"{reason}:{resource_type}"] += 1
+
+    def _on_response(self, response: Response):
+        length = response.headers.get("content-length")
+        with self._lock:
+            self._allowed_requests += 1
+            if length and length.isdigit():
+                self._allowed_bytes += int(length)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "blocked_requests": sum(self._blocked.values()),
+                "blocked_by_type": dict(self._blocked),
+                "allowed_requests": self._allowed_requests,
+                "allowed_bytes": self._allowed_bytes,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._blocked: Counter = Counter()
+            self._allowed_requests = 0
+            self._allowed_bytes = 0
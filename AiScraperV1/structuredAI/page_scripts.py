@@ -0,0 +1,408 @@
+# JavaScript snippets evaluated inside the page by the tools.
+# Each one is a single function expression so it can be passed straight to
+# page.evaluate() together with an options argument, which keeps every scan
+# to one round trip between Python and the browser.
+
+# Shared helpers, prepended to the scripts that need them.
+_HELPERS = """
+    const cssEscape = (value) =>
+        window.CSS && CSS.escape ? CSS.escape(value) : value.replace(/([^\\w-])/g, "\\\\$1");
+
+    const isUnique = (selector) => {
+        try {
+            return document.querySelectorAll(selector).length === 1;
+        } catch (e) {
+            return false;
+        }
+    };
+
+    const uniqueSelector = (el) => {
+        if (el.id && isUnique("#" + cssEscape(el.id))) return "#" + cssEscape(el.id);
+        const tag = el.tagName.toLowerCase();
+        for (const attr of ["name", "data-testid", "aria-label"]) {
+            const value = el.getAttribute(attr);
+            if (!value) continue;
+            const selector = `${tag}[${attr}="${value.replace(/"/g, '\\\\"')}"]`;
+            if (isUnique(selector)) return selector;
+        }
+        const parts = [];
+        let node = el;
+        while (node && node.nodeType === 1 && node !== document.documentElement) {
+            if (node !== el && node.id && isUnique("#" + cssEscape(node.id))) {
+                parts.unshift("#" + cssEscape(node.id));
+                break;
+            }
+            let part = node.tagName.toLowerCase();
+            const parent = node.parentElement;
+            if (parent) {
+                const siblings = Array.from(parent.children).filter(
+                    (child) => child.tagName === node.tagName
+                );
+                if (siblings.length > 1) part += `:nth-of-type(${siblings.indexOf(node) + 1})`;
+            }
+            parts.unshift(part);
+            node = parent;
+        }
+        return parts.join(" > ");
+    };
+
+    const isVisible = (el) => {
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 || rect.height === 0) return false;
+        const style = getComputedStyle(el);
+        return style.visibility !== "hidden" && style.display !== "none" && style.opacity !== "0";
+    };
+
+    const cleanText = (value, limit) => (value || "").replace(/\\s+/g, " ").trim().slice(0, limit);
+"""
+
+# Compact snapshot of every interactive element. Elements get a data-fc-id
+# attribute the first time they are seen so their id stays stable between scans
+# of the same document. The last scan is kept in the page together with a
+# mutation flag and the elements' value, checked and visibility state: with
+# opts.diff only added, changed and removed elements are returned, and nothing
+# is rescanned at all if neither the DOM nor that state has changed.
+INTERACTIVE_SNAPSHOT_JS = (
+    """
+(opts) => {
+"""
+    + _HELPERS
+    + """
+    const ATTRS = ["id", "name", "type", "href", "placeholder", "aria-label", "value", "for", "title", "alt"];
+    const IMPLICIT_ROLES = { a: "link", button: "button", select: "combobox", textarea: "textbox" };
+
+    // The last scan of this document, so a diff scan can report only what
+    // changed. A navigation starts a new document and with it a full scan.
+    const state = window.__fcScanState;
+    const elements = document.querySelectorAll(
+        "a, button, input:not([type=hidden]), select, textarea, [role='button']"
+    );
+    // Filling, checking and selecting only change properties, and stylesheet
+    // rules can hide elements, neither of which the observer sees.
+    const props = Array.from(elements, (el) =>
+        [el.value, el.checked, el.selectedIndex, isVisible(el)].join("|")
+    ).join("\\n");
+    if (opts.diff && state && !state.dirty && state.props === props) {
+        return { mode: "diff", added: [], changed: [], removed: [], unchanged: state.count };
+    }
+
+    let nextId = window.__fcNextId || 1;
+    const records = [];
+    for (const el of elements) {
+        let fcId = el.getAttribute("data-fc-id");
+        if (!fcId) {
+            fcId = String(nextId++);
+            el.setAttribute("data-fc-id", fcId);
+        }
+        const tag = el.tagName.toLowerCase();
+        const rect = el.getBoundingClientRect();
+        const attrs = {};
+        for (const name of ATTRS) {
+            const value = el.getAttribute(name);
+            if (value) attrs[name] = value.slice(0, opts.maxAttrLength);
+        }
+        const record = {
+            id: fcId,
+            tag: tag,
+            role: el.getAttribute("role") || IMPLICIT_ROLES[tag] || (tag === "input" ? el.type : ""),
+            text: cleanText(el.innerText || el.getAttribute("aria-label") || el.value, opts.maxTextLength),
+            attrs: attrs,
+            selector: uniqueSelector(el),
+            visible: isVisible(el),
+            box: [Math.round(rect.x), Math.round(rect.y + window.scrollY), Math.round(rect.width), Math.round(rect.height)],
+        };
+        if (!record.role) delete record.role;
+        if (!record.text) delete record.text;
+        if (!Object.keys(attrs).length) delete record.attrs;
+        records.push(record);
+    }
+    window.__fcNextId = nextId;
+
+    // Elements that only moved are not reported as changed.
+    const current = {};
+    for (const record of records) {
+        const { box, ...rest } = record;
+        current[record.id] = JSON.stringify(rest);
+    }
+    if (!state) {
+        const newState = { dirty: false };
+        // Our own data-fc-id attributes don't count as a change.
+        newState.observer = new MutationObserver((mutations) => {
+            if (mutations.some((m) => m.attributeName !== "data-fc-id")) newState.dirty = true;
+        });
+        newState.observer.observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+        window.__fcScanState = newState;
+    }
+    const scanState = window.__fcScanState;
+    const previous = scanState.records;
+    scanState.records = current;
+    scanState.count = records.length;
+    scanState.props = props;
+    scanState.dirty = false;
+
+    if (!opts.diff || !previous) return { mode: "full", records: records, newPage: !previous };
+    const added = records.filter((r) => !(r.id in previous));
+    const changed = records.filter((r) => r.id in previous && previous[r.id] !== current[r.id]);
+    const removed = Object.keys(previous).filter((id) => !(id in current));
+    return {
+        mode: "diff",
+        added: added,
+        changed: changed,
+        removed: removed,
+        unchanged: records.length - added.length - changed.length,
+    };
+}
+"""
+)
+
+# Links and buttons that sit in the page footer. Pages without a recognisable
+# footer container fall back to links in the bottom part of the document.
+FOOTER_LINKS_JS = (
+    """
+(opts) => {
+"""
+    + _HELPERS
+    + """
+    const FOOTER_SELECTOR =
+        "footer, [role='contentinfo'], #footer, .footer, [id*='footer' i], [class*='footer' i]";
+    const LINK_SELECTOR = "a, button, [role='link'], [role='button']";
+
+    const docHeight = Math.max(document.body.scrollHeight, document.documentElement.scrollHeight);
+    const links = [];
+    for (const el of document.querySelectorAll(LINK_SELECTOR)) {
+        const rect = el.getBoundingClientRect();
+        const top = rect.top + window.scrollY;
+        const inFooter = !!el.closest(FOOTER_SELECTOR);
+        if (!inFooter && top < docHeight * (1 - opts.bottomFraction)) continue;
+        links.push({
+            text: cleanText(el.innerText || el.getAttribute("aria-label") || el.title, 120),
+            href: el.getAttribute("href") || "",
+            selector: uniqueSelector(el),
+            inFooter: inFooter,
+            visible: isVisible(el),
+        });
+    }
+    return links;
+}
+"""
+)
+
+# Structural signature of the current document: tag names plus the attributes
+# that identify elements, without any text content, so rotating copy or ads
+# don't change it. Hashed in Python.
+PAGE_FINGERPRINT_JS = """
+(opts) => {
+    const parts = [location.host + location.pathname];
+    const elements = document.body ? document.body.getElementsByTagName("*") : [];
+    const limit = Math.min(elements.length, opts.maxElements);
+    for (let i = 0; i < limit; i++) {
+        const el = elements[i];
+        const tag = el.tagName.toLowerCase();
+        if (tag === "script" || tag === "style" || tag === "noscript") continue;
+        parts.push(
+            [tag, el.id, el.getAttribute("name"), el.getAttribute("type"), el.getAttribute("href")]
+                .filter(Boolean)
+                .join("|")
+        );
+    }
+    return parts.join("\\n");
+}
+"""
+
+# Structure of the form fields on the page, independent of the host, so sites
+# built on the same lead-form template share it. Hidden inputs are skipped
+# because they often carry per-site tokens. The structure is empty if the page
+# has no fields. visibleFields counts the visible fields a user fills in,
+# without buttons and off-screen honeypots, to tell real forms from tiny ones.
+FORM_FINGERPRINT_JS = (
+    """
+() => {
+"""
+    + _HELPERS
+    + """
+    const BUTTON_TYPES = new Set(["submit", "button", "image", "reset"]);
+    // Honeypots are often moved off the page rather than hidden.
+    const onPage = (el) => {
+        const rect = el.getBoundingClientRect();
+        return rect.right > 0 && rect.bottom + window.scrollY > 0;
+    };
+    const fields = document.querySelectorAll("input, select, textarea, button");
+    const parts = [];
+    let visibleFields = 0;
+    for (const el of fields) {
+        const type = (el.getAttribute("type") || "").toLowerCase();
+        if (type === "hidden") continue;
+        parts.push(
+            [el.tagName.toLowerCase(), type, el.getAttribute("name"), el.id].join("|")
+        );
+        const isButton = el.tagName === "BUTTON" || BUTTON_TYPES.has(type);
+        if (!isButton && isVisible(el) && onPage(el)) visibleFields++;
+    }
+    return { structure: parts.join("\\n"), visibleFields: visibleFields };
+}
+"""
+)
+
+# Records the time of the last structural DOM change so the settle logic can
+# tell when the page stopped changing. Style and class churn from animations
+# is ignored on purpose. Returns the ms since the last change, or -1 when the
+# observer was just installed in a new document.
+DOM_QUIET_JS = """
+() => {
+    if (!window.__fcSettleObserver) {
+        window.__fcLastMutation = Date.now();
+        window.__fcSettleObserver = new MutationObserver(() => {
+            window.__fcLastMutation = Date.now();
+        });
+        window.__fcSettleObserver.observe(document, {
+            subtree: true,
+            childList: true,
+            characterData: true,
+            attributes: true,
+            attributeFilter: ["hidden", "disabled", "aria-hidden", "aria-busy", "open"],
+        });
+        return -1;
+    }
+    return Date.now() - window.__fcLastMutation;
+}
+"""
+
+# Finds TCPA consent text. Walks the visible text nodes outside the page footer,
+# scores each containing block against the pattern set (compiled once per
+# document) and weights the score by the distance to the nearest submit-type
+# button, since the disclaimer has to sit next to the action it covers.
+TCPA_CANDIDATES_JS = (
+    """
+(opts) => {
+"""
+    + _HELPERS
+    + """
+    // Only the page footer: the broad *footer* match of FOOTER_LINKS_JS also
+    // hits .modal-footer or .form-footer, where lead forms put the submit
+    // button and the consent text. A footer that holds a form still counts.
+    const FOOTER_SELECTOR = "footer, [role='contentinfo'], #footer, .footer";
+    const inPageFooter = (el) => {
+        const footer = el.closest(FOOTER_SELECTOR);
+        return !!footer && !footer.querySelector("form");
+    };
+    const BUTTON_SELECTOR =
+        "button, input[type='submit'], input[type='button'], input[type='image'], [role='button'], a[class*='btn' i], a[class*='button' i], a[class*='cta' i]";
+    const BUTTON_TEXT = /submit|continue|next|get|quote|start|see|compare|finish|rates|send|apply/i;
+    const SKIP_TAGS = new Set(["SCRIPT", "STYLE", "NOSCRIPT", "TEMPLATE"]);
+
+    if (!window.__fcTcpaPatterns || window.__fcTcpaPatternsKey !== opts.patternsKey) {
+        window.__fcTcpaPatterns = opts.patterns.map((p) => ({ re: new RegExp(p.source, "i"), weight: p.weight }));
+        window.__fcTcpaPatternsKey = opts.patternsKey;
+    }
+    const patterns = window.__fcTcpaPatterns;
+
+    const buttons = Array.from(document.querySelectorAll(BUTTON_SELECTOR))
+        .filter((el) => isVisible(el) && !inPageFooter(el))
+        .filter((el) => el.type === "submit" || BUTTON_TEXT.test(el.innerText || el.value || ""))
+        .map((el) => el.getBoundingClientRect());
+
+    const gap = (a, b) => {
+        const dx = Math.max(0, a.left - b.right, b.left - a.right);
+        const dy = Math.max(0, a.top - b.bottom, b.top - a.bottom);
+        return Math.sqrt(dx * dx + dy * dy);
+    };
+
+    const seen = new Set();
+    const candidates = [];
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    while (walker.nextNode()) {
+        const node = walker.currentNode;
+        const el = node.parentElement;
+        if (!el || seen.has(el) || SKIP_TAGS.has(el.tagName) || node.textContent.trim().length < 10) continue;
+        seen.add(el);
+        // Score the nearest block so text split over inline tags is read as one sentence.
+        let block = el.closest("p, li, label, small, td, section, article, div") || el;
+        if ((block.innerText || "").length > opts.maxBlockLength) block = el;
+        if (inPageFooter(block) || !isVisible(block)) continue;
+        const text = cleanText(block.innerText, opts.maxTextLength);
+
+        let miss = 1;
+        for (const pattern of patterns) {
+            if (pattern.re.test(text)) miss *= 1 - pattern.weight;
+        }
+        const textScore = 1 - miss;
+        if (textScore < opts.minTextScore) continue;
+
+        const rect = block.getBoundingClientRect();
+        const distance = buttons.length ? Math.min(...buttons.map((b) => gap(rect, b))) : null;
+        const proximity = distance === null ? 0 : Math.max(0, 1 - distance / opts.proximityPx);
+        candidates.push({
+            selector: uniqueSelector(block),
+            text: text,
+            textScore: Math.round(textScore * 100) / 100,
+            distance: distance === null ? null : Math.round(distance),
+            confidence: Math.round(textScore * (0.6 + 0.4 * proximity) * 100) / 100,
+        });
+    }
+    // Nested blocks can produce the same selector twice, keep the best of each.
+    const best = new Map();
+    for (const c of candidates) {
+        if (!best.has(c.selector) || best.get(c.selector).confidence < c.confidence) best.set(c.selector, c);
+    }
+    return Array.from(best.values())
+        .sort((a, b) => b.confidence - a.confidence)
+        .slice(0, opts.maxCandidates);
+}
+"""
+)
+
+# Splits the visible page text into blocks and ranks them by the weighted
+# keyword patterns (score = 1 - prod(1 - weight) over the matching patterns).
+# Blocks without a match follow in document order, so paging through the
+# result eventually covers the whole page.
+TEXT_BLOCKS_JS = (
+    """
+(opts) => {
+"""
+    + _HELPERS
+    + """
+    const BLOCK_SELECTOR = "p, li, label, small, td, th, dd, dt, h1, h2, h3, h4, h5, h6, blockquote, figcaption, section, article, div";
+    const SKIP_TAGS = new Set(["SCRIPT", "STYLE", "NOSCRIPT", "TEMPLATE"]);
+
+    if (!window.__fcTextPatterns || window.__fcTextPatternsKey !== opts.patternsKey) {
+        window.__fcTextPatterns = opts.patterns.map((p) => ({ re: new RegExp(p.source, "i"), weight: p.weight }));
+        window.__fcTextPatternsKey = opts.patternsKey;
+    }
+    const patterns = window.__fcTextPatterns;
+
+    const seen = new Set();
+    const blocks = [];
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    while (walker.nextNode()) {
+        const el = walker.currentNode.parentElement;
+        if (!el || SKIP_TAGS.has(el.tagName) || !walker.currentNode.textContent.trim()) continue;
+        let block = el.closest(BLOCK_SELECTOR) || el;
+        if ((block.innerText || "").length > opts.maxBlockLength) block = el;
+        if (seen.has(block)) continue;
+        seen.add(block);
+        if (!isVisible(block)) continue;
+        const text = cleanText(block.innerText, opts.maxBlockLength);
+        if (text.length < opts.minTextLength) continue;
+
+        let miss = 1;
+        for (const pattern of patterns) {
+            if (pattern.re.test(text)) miss *= 1 - pattern.weight;
+        }
+        blocks.push({ order: blocks.length, score: Math.round((1 - miss) * 100) / 100, block, text });
+    }
+
+    blocks.sort((a, b) => b.score - a.score || a.order - b.order);
+    const start = (opts.page - 1) * opts.pageSize;
+    return {
+        total: blocks.length,
+        matching: blocks.filter((b) => b.score > 0).length,
+        windows: blocks.slice(start, start + opts.pageSize).map((b, i) => ({
+            rank: start + i + 1,
+            score: b.score,
+            selector: uniqueSelector(b.block),
+            text: b.text.slice(0, opts.maxTextLength),
+        })),
+    };
+}
+"""
+)
@@ -0,0 +1,156 @@
+import logging
+import time
+from dataclasses import dataclass
+
+from playwright.sync_api import BrowserContext, Page, Request
+
+import config
+from page_scripts import DOM_QUIET_JS
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_MS = 50
+# Connections that stay open by design and never count as in flight.
+STREAMING_RESOURCE_TYPES = {"eventsource", "websocket", "ping"}
+
+
+@dataclass
+class SettleResult:
+    elapsed_ms: int
+    # "quiet", "new_page" or "timeout"
+    reason: str
+    navigated: bool = False
+    new_page: Page | None = None
+
+    def describe(self) -> str:
+        # No timing here: the text goes to the model, and a duration would give
+        # every LLM call after a page action a new cache key.
+        return f"page settled ({self.reason})"
+
+
+class PageSettler:
+    """
+    Waits for a page to settle after an action, instead of sleeping for a fixed time.
+
+    Use it as a context manager around the action and call `wait()` once the
+    action returned:
+
+        with PageSettler(page, context) as settler:
+            page.click(selector)
+            result = settler.wait()
+
+    The page counts as settled when no main-frame navigation is pending, no
+    request has been in flight and the DOM has not changed for `quiet_ms`.
+    Like Playwright's networkidle, streaming connections are ignored, and so
+    are requests in flight for more than `long_request_ms`, e.g. long polls.
+    A new tab opened by the action ends the wait as soon as it has loaded its
+    DOM. `timeout_ms` is an upper bound, reaching it is not an error.
+    """
+
+    def __init__(
+        self,
+        page: Page,
+        context: BrowserContext,
+        quiet_ms: int = config.SETTLE_QUIET_MS,
+        timeout_ms: int = config.SETTLE_TIMEOUT_MS,
+        long_request_ms: int = config.SETTLE_LONG_REQUEST_MS,
+    ):
+        self.page = page
+        self.context = context
+        self.quiet_ms = quiet_ms
+        self.timeout_ms = timeout_ms
+        self.long_request_ms = long_request_ms
+        # Requests in flight and when they started.
+        self._inflight: dict[Request, float] = {}
+        self._last_activity = 0.0
+        self._navigated = False
+        self._new_pages: list[Page] = []
+
+    def __enter__(self):
+        self._last_activity = time.monotonic()
+        self.page.on("request", self._on_request)
+        self.page.on("requestfinished", self._on_request_done)
+        self.page.on("requestfailed", self._on_request_done)
+        self.page.on("framenavigated", self._on_navigated)
+        self.context.on("page", self._on_new_page)
+        try:
+            self.page.evaluate(DOM_QUIET_JS)
+        except Exception:
+            pass  # The page may be mid-navigation, wait() re-installs the observer.
+        return self
+
+    def __exit__(self, *exc_info):
+        self.page.remove_listener("request", self._on_request)
+        self.page.remove_listener("requestfinished", self._on_request_done)
+        self.page.remove_listener("requestfailed", self._on_request_done)
+        self.page.remove_listener("framenavigated", self._on_navigated)
+        self.context.remove_listener("page", self._on_new_page)
+
+    def _on_request(self, request: Request):
+        if request.resource_type in STREAMING_RESOURCE_TYPES:
+            return
+        self._last_activity = time.monotonic()
+        self._inflight[request] = self._last_activity
+
+    def _on_request_done(self, request: Request):
+        if self._inflight.pop(request, None) is not None:
+            self._last_activity = time.monotonic()
+
+    def _network_busy(self, now: float) -> bool:
+        return any(
+            (now - started) * 1000 < self.long_request_ms
+            for started in self._inflight.values()
+        )
+
+    def _on_navigated(self, frame):
+        if frame == self.page.main_frame:
+            self._navigated = True
+            self._last_activity = time.monotonic()
+
+    def _on_new_page(self, page: Page):
+        self._new_pages.append(page)
+
+    def _dom_quiet_ms(self) -> int:
+        try:
+            return self.page.evaluate(DOM_QUIET_JS)
+        except Exception:
+            return -1  # Execution context destroyed by a navigation.
+
+    def wait(self) -> SettleResult:
+        start = time.monotonic()
+        deadline = start + self.timeout_ms / 1000
+        reason = "timeout"
+        new_page = None
+
+        while time.monotonic() < deadline:
+            if self._new_pages:
+                new_page = self._new_pages[-1]
+                remaining = max(1, int((deadline - time.monotonic()) * 1000))
+                try:
+                    new_page.wait_for_load_state("domcontentloaded", timeout=remaining)
+                except Exception as e:
+                    logger.warning(f"New tab did not finish loading: {e}")
+                reason = "new_page"
+                break
+
+            now = time.monotonic()
+            network_quiet = (
+                not self._network_busy(now)
+                and (now - self._last_activity) * 1000 >= self.quiet_ms
+            )
+            if network_quiet and self._dom_quiet_ms() >= self.quiet_ms:
+                reason = "quiet"
+                break
+            self.page.wait_for_timeout(POLL_INTERVAL_MS)
+
+        result = SettleResult(
+            elapsed_ms=int((time.monotonic() - start) * 1000),
+            reason=reason,
+            navigated=self._navigated,
+            new_page=new_page,
+        )
+        logger.info(
+            f"Settle: {result.describe()} in {result.elapsed_ms} ms, "
+            f"navigated={result.navigated}"
+        )
+        return result
@@ -0,0 +1,123 @@
+import heapq
+import json
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class PerfTracer:
+    """
+    Collects timing spans for a run and writes each one as a JSONL line.
+
+    A span has a stage name ("goto", "llm", "tool:click", ...), a duration and
+    free-form attributes such as the FSM state or token counts. Spans recorded
+    inside `url_scope` carry the URL being processed by the current thread.
+    Durations are also kept per stage in memory for the end-of-run summary.
+    Without a path nothing is written to disk.
+    """
+
+    def __init__(self, path: str | None = None, slowest_urls: int = 10):
+        self.path = path
+        self._file = open(path, "a", buffering=1, encoding="utf-8") if path else None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._durations: dict[str, list[float]] = defaultdict(list)
+        self._slowest: list[tuple[float, str]] = []
+        self._slowest_count = slowest_urls
+
+    @property
+    def current_url(self) -> str | None:
+        return getattr(self._local, "url", None)
+
+    @contextmanager
+    def url_scope(self, url: str):
+        """Records a "url" span and tags every span inside it with the URL."""
+        self._local.url = url
+        try:
+            with self.span("url") as attrs:
+                yield attrs
+        finally:
+            self._local.url = None
+
+    @contextmanager
+    def span(self, stage: str, **attrs):
+        """
+        Times the block as one span. The yielded dict can be filled with more
+        attributes (e.g. token counts) before the block ends.
+        """
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000, **attrs)
+
+    def record(self, stage: str, duration_ms: float, **attrs):
+        url = self.current_url
+        entry = {
+            "ts": round(time.time(), 3),
+            "stage": stage,
+            "url": url,
+            "ms": round(duration_ms, 1),
+            **attrs,
+        }
+        with self._lock:
+            self._durations[stage].append(duration_ms)
+            if stage == "url" and url:
+                item = (duration_ms, url)
+                if len(self._slowest) < self._slowest_count:
+                    heapq.heappush(self._slowest, item)
+                else:
+                    heapq.heappushpop(self._slowest, item)
+            if self._file:
+                self._file.write(json.dumps(entry, default=str) + "\n")
+
+    def summary(self) -> dict:
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": len(values),
+                    "p50_ms": round(percentile(values, 50), 1),
+                    "p95_ms": round(percentile(values, 95), 1),
+                    "total_s": round(sum(values) / 1000, 1),
+                }
+                for stage, values in sorted(self._durations.items())
+            }
+            slowest = [
+                {"url": url, "ms": round(ms, 1)}
+                for ms, url in sorted(self._slowest, reverse=True)
+            ]
+        return {"stages": stages, "slowest_urls": slowest}
+
+    def log_summary(self):
+        summary = self.summary()
+        lines = ["Performance summary:"]
+        lines.append(
+            f"  {'stage':<32}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}{'total s':>12}"
+        )
+        for stage, stats in summary["stages"].items():
+            lines.append(
+                f"  {stage:<32}{stats['count']:>8}{stats['p50_ms']:>12}"
+                f"{stats['p95_ms']:>12}{stats['total_s']:>12}"
+            )
+        if summary["slowest_urls"]:
+            lines.append("  Slowest URLs:")
+            for item in summary["slowest_urls"]:
+                lines.append(f"    {item['ms'] / 1000:>8.1f} s  {item['url']}")
+        logger.info("\n".join(lines))
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            logger.info(f"Performance trace written to '{self.path}'.")
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import socket
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urlsplit, urlunsplit
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    )
+}
+# Servers that refuse HEAD often answer a GET normally.
+_RETRY_WITH_GET = {400, 403, 405, 501}
+
+
+@dataclass
+class PreflightResult:
+    url: str  # as given in the input
+    target: str = ""  # normalized URL to load in the browser
+    final_url: str = ""  # where the redirects ended
+    status: int | None = None
+    # Why the URL is skipped, empty if it should be verified.
+    reason: str = ""
+
+
+def normalize_url(url: str) -> str:
+    """Adds a missing scheme and lowercases the host, e.g. 'Example.com' -> 'https://example.com'."""
+    url = url.strip()
+    if not url:
+        return ""
+    if "://" not in url:
+        url = "https://" + url.lstrip("/")
+    parts = urlsplit(url)
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, "")
+    )
+
+
+def site_key(url: str) -> str:
+    """Key for duplicate detection: host without 'www.', path and query."""
+    parts = urlsplit(url)
+    host = parts.netloc.lower().removeprefix("www.")
+    key = host + parts.path.rstrip("/")
+    return key + ("?" + parts.query if parts.query else "")
+
+
+def _request(url: str, method: str, timeout: float) -> tuple[int, str]:
+    request = urllib.request.Request(url, method=method, headers=_HEADERS)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status, response.geturl()
+
+
+def check_url(url: str, timeout: float = config.PREFLIGHT_TIMEOUT_S) -> tuple:
+    """
+    Returns (status, final_url, error). Any HTTP answer counts as reachable,
+    since sites that reject scripts with 403 often work fine in the browser.
+    """
+    try:
+        try:
+            status, final_url = _request(url, "HEAD", timeout)
+        except urllib.error.HTTPError as e:
+            if e.code not in _RETRY_WITH_GET:
+                raise
+            status, final_url = _request(url, "GET", timeout)
+        return status, final_url, ""
+    except urllib.error.HTTPError as e:
+        return e.code, e.geturl() or url, ""
+    except (urllib.error.URLError, socket.timeout, OSError, ValueError) as e:
+        return None, "", str(getattr(e, "reason", e))
+
+
+def _preflight_one(url: str, timeout: float) -> PreflightResult:
+    result = PreflightResult(url=url, target=normalize_url(url))
+    if not result.target:
+        result.reason = "empty URL"
+        return result
+
+    status, final_url, error = check_url(result.target, timeout)
+    if error and "://" not in url.strip():
+        # Bare domains that don't serve https may still serve http.
+        fallback = "http://" + result.target.split("://", 1)[1]
+        status, final_url, fallback_error = check_url(fallback, timeout)
+        if not fallback_error:
+            result.target, error = fallback, ""
+    result.status, result.final_url = status, final_url
+    if error:
+        # results_writer.PREFLIGHT_UNREACHABLE: --resume retries these.
+        result.reason = f"unreachable ({error})"
+    return result
+
+
+async def _preflight_all(
+    urls: list[str], timeout: float, concurrency: int
+) -> list[PreflightResult]:
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(
+        max_workers=max(1, concurrency), thread_name_prefix="preflight"
+    ) as executor:
+        return await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, _preflight_one, url, timeout)
+                for url in urls
+            )
+        )
+
+
+def run_preflight(
+    urls: list[str],
+    timeout: float = config.PREFLIGHT_TIMEOUT_S,
+    concurrency: int = config.PREFLIGHT_CONCURRENCY,
+) -> list[PreflightResult]:
+    """
+    Normalizes, health-checks and deduplicates the URLs before any browser is
+    started. Returns one result per input URL, in input order. Identical
+    inputs are checked once, and a URL whose redirects end at the same site
+    as an earlier one is marked as its duplicate.
+    """
+    # First spelling of every normalized URL, it decides about the http fallback.
+    unique: dict[str, str] = {}
+    for url in urls:
+        unique.setdefault(normalize_url(url), url)
+    checked = asyncio.run(_preflight_all(list(unique.values()), timeout, concurrency))
+    by_target = dict(zip(unique, checked))
+
+    results, first_by_site = [], {}
+    for url in urls:
+        check = by_target[normalize_url(url)]
+        result = PreflightResult(
+            url=url,
+            target=check.target,
+            final_url=check.final_url,
+            status=check.status,
+            reason=check.reason,
+        )
+        if not result.reason:
+            key = site_key(result.final_url or result.target)
+            if key in first_by_site:
+                result.reason = f"duplicate of {first_by_site[key]}"
+            else:
+                first_by_site[key] = url
+        results.append(result)
+
+    skipped = [r for r in results if r.reason]
+    logger.info(
+        f"Preflight: {len(results) - len(skipped)} of {len(results)} URL(s) to verify, "
+        f"{sum(r.reason.startswith('unreachable') for r in skipped)} unreachable, "
+        f"{sum(r.reason.startswith('duplicate') for r in skipped)} duplicate(s)."
+    )
+    return results
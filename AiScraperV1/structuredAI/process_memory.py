@@ -0,0 +1,91 @@
+import os
+import threading
+
+# Resident memory of processes read from /proc. Chromium runs as a tree of
+# child processes, so the interesting number is the sum over the whole tree.
+# On systems without /proc (Windows, macOS) memory cannot be measured and
+# these helpers return None.
+
+
+def _read_rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _children_by_parent() -> dict[int, list[int]]:
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as stat:
+                # The command name can contain spaces, the ppid follows its closing paren.
+                ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def rss_supported() -> bool:
+    return os.path.isdir("/proc")
+
+
+def process_tree_rss_mb(pid: int | None = None) -> float | None:
+    """Total resident memory in MB of a process and all of its descendants."""
+    pid = pid or os.getpid()
+    if not rss_supported():
+        return None
+
+    children = _children_by_parent()
+    total_kb, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total_kb += _read_rss_kb(current)
+        stack.extend(children.get(current, []))
+    return total_kb / 1024
+
+
+def processes_rss_mb(pids) -> float | None:
+    """Total resident memory in MB of exactly the given processes."""
+    if not rss_supported():
+        return None
+    return sum(_read_rss_kb(pid) for pid in set(pids)) / 1024
+
+
+class PeakMemorySampler:
+    """
+    Samples the RSS of the process tree in a background thread and keeps the
+    peak, which stays None where memory cannot be measured.
+    """
+
+    def __init__(self, interval_s: float = 0.5, pid: int | None = None):
+        self.interval_s = interval_s
+        self.pid = pid
+        self.peak_mb: float | None = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="memory-sampler", daemon=True
+        )
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss_mb = process_tree_rss_mb(self.pid)
+            if rss_mb is None:
+                return
+            self.peak_mb = max(self.peak_mb or 0.0, rss_mb)
+            self._stop.wait(self.interval_s)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
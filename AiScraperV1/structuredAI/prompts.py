@@ -4,7 +4,7 @@ You are a compliance verification agent. Your current objective is to verify and
 
 **Workflow:**
 1.  Use `find_interactive_elements` to get a list of all elements.
-2.  Analyze the list to find selectors for the three required links.
+2.  Analyze the list to find the three required links and use each element's `selector` value with the other tools.
 3.  For each link found, use the `screenshot_element` tool. Name them `privacy_policy.png`, `terms.png`, and `do_not_sell.png`.
 4.  After checking for all three, your final response MUST be a summary of your findings (e.g., "Privacy Policy: Found, Terms: Not Found, DNS: Found") followed by the phrase "Finished with footer analysis.".
 """,
@@ -13,13 +13,15 @@ You are a compliance verification agent. Your primary goal now is to find the TC
 
 **Workflow for EVERY Page in this State:**
 1.  **PRIORITY 1: CHECK FOR TCPA DISCLAIMER.**
-    *   First, use the `find_interactive_elements` tool to scan the CURRENT page.
+    *   First, use the `find_interactive_elements` tool to scan the CURRENT page. `find_tcpa_disclaimer` returns ranked disclaimer candidates, including text that is not inside an interactive element.
     *   Analyze the elements for text patterns like "By clicking", "By submitting", "you agree to be contacted", "consent to receive marketing". This MUST be displayed prominently, often near submission buttons, it CANNOT be inside of a footer link.
     *   **IF YOU FIND THE TCPA DISCLAIMER:** Your job is almost done. Use `screenshot_element` to save it as `tcpa_disclaimer.png`. Then, your final response MUST be "TCPA Found. Finished with form navigation.". Do NOT fill any more fields.
 
 2.  **PRIORITY 2: NAVIGATE (Only if TCPA is NOT found).**
     *   If and only if the TCPA disclaimer is not on the current page, identify the necessary input fields and the 'Continue' or 'Submit' button from your element scan.
-    *   Use the `fill` and `click` tools to submit the current page and move to the next one. If the 'click' tool does not work on the first click use the 'click' tool on the first parent elements of the correct label.
+    *   Use ONE `form_actions` call to fill every field of the current page and click the 'Continue' or 'Submit' button, e.g. steps `[{"action": "fill", "selector": "#zip", "value": "90210"}, {"action": "select", "selector": "#state", "value": "CA"}, {"action": "check", "selector": "#agree"}, {"action": "click", "selector": "#next"}]`. Its result already ends with a scan of the page (only the changes if it is still the same page), so you do not need to call `find_interactive_elements` again.
+    *   When you do rescan a page you already scanned, call `find_interactive_elements` with `changes_only` set to true to get only the added, changed and removed elements.
+    *   If a step fails, fix it with the single-step `fill` and `click` tools. If the 'click' tool does not work on the first click use the 'click' tool on the first parent elements of the correct label.
     *   The loop will then repeat, and you will check the new page for the TCPA disclaimer.
 """,
     "DISCLAIMER_VERIFICATION": """
@@ -0,0 +1,233 @@
+import logging
+import random
+import re
+import threading
+import time
+
+import config
+from budgets import BudgetExceededError
+from history_manager import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# A bare "429" also turns up in ids, token counts and URLs, so it only counts
+# as a status code next to the words around one.
+_RATE_LIMIT_TEXT = re.compile(
+    r"\b429\b\s*(too many requests|resource.?exhausted)"
+    r"|(http|status|code|error)\W{0,3}429\b"
+    r"|too many requests|resource has been exhausted|resource_exhausted"
+    r"|rate limit",
+    re.IGNORECASE,
+)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for 429 / ResourceExhausted errors, also when wrapped by LangChain."""
+    while error is not None:
+        if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+            return True
+        for attr in ("code", "status_code"):
+            if getattr(error, attr, None) == 429:
+                return True
+        if _RATE_LIMIT_TEXT.search(str(error)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` tokens per minute and
+    holding at most one minute's worth. The level can go negative when a
+    caller is charged more than it reserved, later callers then wait longer.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float, deadline: float | None = None):
+        """
+        Blocks until `amount` tokens (capped at the capacity) are available.
+        Raises BudgetExceededError if they would only be available after
+        `deadline`, a time.monotonic() value.
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                wait = (amount - self.level) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise BudgetExceededError(
+                    f"Rate limit wait of {wait:.1f}s exceeds the time budget."
+                )
+            time.sleep(min(wait, 1.0))
+
+    def charge(self, amount: float):
+        """Takes tokens without waiting, e.g. to correct an estimate afterwards."""
+        with self._lock:
+            self._refill()
+            self.level -= amount
+
+
+class LLMRateLimiter:
+    """
+    Request and token rate limits for LLM calls, shared by all worker threads.
+
+    Every call waits for a concurrency slot, one request from the RPM bucket
+    and its estimated input tokens from the TPM bucket; the TPM bucket is
+    corrected with the reported usage afterwards. Rate-limit errors are
+    retried with jittered exponential backoff. The concurrency limit adapts
+    AIMD-style: it is halved on every throttled call and grows back by about
+    one slot per limit's worth of successful calls. With a deadline, a call
+    raises BudgetExceededError instead of waiting or backing off past it.
+    """
+
+    def __init__(
+        self,
+        rpm: int = config.LLM_RPM,
+        tpm: int = config.LLM_TPM,
+        max_concurrency: int = config.LLM_MAX_CONCURRENCY,
+        max_retries: int = config.LLM_MAX_RETRIES,
+        base_delay_s: float = 1.0,
+        max_delay_s: float = 60.0,
+    ):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+
+        self.concurrency_limit = float(self.max_concurrency)
+        self._in_flight = 0
+        self._slots = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "throttled": 0,
+            "failed": 0,
+            "queue_wait_s": 0.0,
+            "max_queue_wait_s": 0.0,
+        }
+
+    def wrap(self, runnable, deadline=None) -> "RateLimitedRunnable":
+        return RateLimitedRunnable(runnable, self, deadline)
+
+    def _acquire_slot(self, deadline: float | None):
+        with self._slots:
+            while self._in_flight >= int(self.concurrency_limit):
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        raise BudgetExceededError(
+                            "No LLM slot became free within the time budget."
+                        )
+                self._slots.wait(timeout)
+            self._in_flight += 1
+
+    def _release_slot(self, throttled: bool):
+        with self._slots:
+            self._in_flight -= 1
+            if throttled:
+                self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+            else:
+                self.concurrency_limit = min(
+                    float(self.max_concurrency),
+                    self.concurrency_limit + 1 / self.concurrency_limit,
+                )
+            self._slots.notify_all()
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps workers that were throttled together from retrying together.
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * 2**attempt))
+
+    def invoke(self, runnable, messages, deadline: float | None = None):
+        estimated_tokens = estimate_tokens(messages)
+        queue_wait = 0.0
+        for attempt in range(self.max_retries + 1):
+            start = time.monotonic()
+            self._acquire_slot(deadline)
+            try:
+                if self.requests:
+                    self.requests.acquire(1, deadline)
+                if self.tokens:
+                    self.tokens.acquire(estimated_tokens, deadline)
+            except BudgetExceededError:
+                self._release_slot(False)
+                raise
+            queue_wait += time.monotonic() - start
+
+            try:
+                response = runnable.invoke(messages)
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                self._release_slot(throttled)
+                if not throttled or attempt == self.max_retries:
+                    self._count("failed")
+                    raise
+                self._count("throttled")
+                delay = self._backoff(attempt)
+                if deadline is not None and time.monotonic() + delay > deadline:
+                    raise BudgetExceededError(
+                        f"LLM rate limited, a retry in {delay:.1f}s would exceed the time budget."
+                    ) from e
+                logger.warning(
+                    f"LLM rate limited (attempt {attempt + 1}), retrying in {delay:.1f}s "
+                    f"with concurrency {int(self.concurrency_limit)}: {e}"
+                )
+                time.sleep(delay)
+                continue
+
+            self._release_slot(False)
+            usage = getattr(response, "usage_metadata", None) or {}
+            if self.tokens and usage.get("total_tokens"):
+                self.tokens.charge(usage["total_tokens"] - estimated_tokens)
+            with self._stats_lock:
+                self._stats["calls"] += 1
+                self._stats["queue_wait_s"] += queue_wait
+                self._stats["max_queue_wait_s"] = max(
+                    self._stats["max_queue_wait_s"], queue_wait
+                )
+            response.response_metadata["queue_wait_ms"] = round(queue_wait * 1000, 1)
+            return response
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_wait_s"] = round(stats["queue_wait_s"], 2)
+        stats["max_queue_wait_s"] = round(stats["max_queue_wait_s"], 2)
+        stats["concurrency_limit"] = int(self.concurrency_limit)
+        return stats
+
+
+class RateLimitedRunnable:
+    """
+    Drop-in for a bound chat model whose invoke goes through the limiter.
+    `deadline` is called on every invoke and returns the current deadline.
+    """
+
+    def __init__(self, runnable, limiter: LLMRateLimiter, deadline=None):
+        self.runnable = runnable
+        self.limiter = limiter
+        self.deadline = deadline
+
+    def invoke(self, messages):
+        deadline = self.deadline() if self.deadline else None
+        return self.limiter.invoke(self.runnable, messages, deadline)
@@ -0,0 +1,127 @@
+import csv
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Summary of the placeholder rows written for URLs no worker got to.
+NOT_PROCESSED = "CRITICAL_FAILURE: URL was not processed"
+# Summary of URLs the preflight could not reach, often only for the moment.
+PREFLIGHT_UNREACHABLE = "PREFLIGHT_SKIPPED: unreachable"
+
+
+def is_completed_row(row: dict) -> bool:
+    """
+    False for placeholder rows and URLs that were unreachable in the
+    preflight, their URL still has to be verified.
+    """
+    return bool(row.get("url")) and not (
+        row.get("raw_output_summary") or ""
+    ).startswith((NOT_PROCESSED, PREFLIGHT_UNREACHABLE))
+
+
+def load_completed_rows(path: str) -> dict[str, dict]:
+    """The latest real result row per URL of an existing results CSV."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, mode="r", newline="", encoding="utf-8") as infile:
+        return {
+            row["url"]: row for row in csv.DictReader(infile) if is_completed_row(row)
+        }
+
+
+def load_completed_urls(path: str) -> set[str]:
+    """Returns the URLs that already have a real result row in an existing results CSV."""
+    return set(load_completed_rows(path))
+
+
+class ResultWriter:
+    """
+    Writes result rows to the output CSV as soon as their URL is done.
+
+    Workers finish URLs out of order, and every row is appended and flushed
+    right away, so the file on disk is always a valid checkpoint to resume
+    from. `close` then rewrites the file in the order of `urls` with one row
+    per input line: a URL listed twice keeps two rows, and real results win
+    over the placeholders of earlier runs. Appending to a CSV with another
+    header first rewrites it with `fieldnames`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fieldnames: list[str],
+        urls: list[str],
+        append: bool = False,
+    ):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.urls = list(urls)
+        self._lock = threading.Lock()
+        exists = append and os.path.exists(path)
+        if exists and self._read_header() != fieldnames:
+            logger.warning(
+                f"'{path}' has different columns, rewriting it with the current ones."
+            )
+            self._rewrite(self._read_rows())
+        self._file = open(
+            path, mode="a" if exists else "w", newline="", encoding="utf-8"
+        )
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        if not exists:
+            self._writer.writeheader()
+            self._file.flush()
+        self.rows_written = 0
+
+    def submit(self, row: dict):
+        with self._lock:
+            self._writer.writerow(row)
+            self._file.flush()
+            self.rows_written += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self._sort()
+        logger.info(f"Wrote {self.rows_written} result row(s) to '{self.path}'.")
+
+    def _read_header(self) -> list[str]:
+        with open(self.path, mode="r", newline="", encoding="utf-8") as infile:
+            return next(csv.reader(infile), [])
+
+    def _read_rows(self) -> list[dict]:
+        with open(self.path, mode="r", newline="", encoding="utf-8") as infile:
+            return list(csv.DictReader(infile))
+
+    def _sort(self):
+        # Per URL the rows to keep, latest first: real results, then placeholders.
+        by_url: dict[str, list[dict]] = {}
+        for row in self._read_rows():
+            by_url.setdefault(row.get("url", ""), []).append(row)
+        for url, rows in by_url.items():
+            by_url[url] = [r for r in reversed(rows) if is_completed_row(r)] + [
+                r for r in reversed(rows) if not is_completed_row(r)
+            ]
+
+        ordered = []
+        for url in self.urls:
+            if by_url.get(url):
+                ordered.append(by_url[url].pop(0))
+        # Rows of URLs that are not in the input, e.g. from an older input file.
+        listed = set(self.urls)
+        for url, rows in by_url.items():
+            if url not in listed:
+                ordered.extend(reversed(rows))
+        self._rewrite(ordered)
+
+    def _rewrite(self, rows: list[dict]):
+        # Replace the file in one step, so a crash here cannot lose rows.
+        temp_path = self.path + ".tmp"
+        with open(temp_path, mode="w", newline="", encoding="utf-8") as outfile:
+            writer = csv.DictWriter(
+                outfile, fieldnames=self.fieldnames, extrasaction="ignore"
+            )
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(temp_path, self.path)
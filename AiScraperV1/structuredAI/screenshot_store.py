@@ -0,0 +1,158 @@
+import hashlib
+import io
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+from urllib.parse import urlsplit
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed for WebP output.
+    Image = None
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOT_FORMATS = ("png", "jpeg", "webp")
+_EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+_BLOB_DIR = "_blobs"
+
+
+def url_namespace(url: str) -> str:
+    """Filesystem-safe directory name for the screenshots of one URL."""
+    parts = urlsplit(url if "://" in url else f"http://{url}")
+    slug = re.sub(r"[^A-Za-z0-9.-]+", "_", f"{parts.netloc}{parts.path}").strip("_")
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:8]
+    return f"{slug[:80]}_{digest}"
+
+
+class ScreenshotStore:
+    """
+    Content-addressed screenshot storage with a background writer.
+
+    `save` only hashes the captured bytes and queues them, so the agent loop
+    does not wait for encoding or disk writes. Every distinct image is stored
+    once under `<root>/_blobs/` and hardlinked (copied where links are not
+    supported) to `<root>/<namespace>/<filename>`, so the many sites that
+    share a vendor footer cost one file. WebP is encoded with Pillow; without
+    it the store falls back to PNG.
+    """
+
+    def __init__(
+        self,
+        root_dir: str = config.SCREENSHOT_DIR,
+        fmt: str = config.SCREENSHOT_FORMAT,
+        quality: int = config.SCREENSHOT_QUALITY,
+        max_pending: int = 64,
+    ):
+        fmt = fmt.lower().replace("jpg", "jpeg")
+        if fmt not in SCREENSHOT_FORMATS:
+            raise ValueError(
+                f"Unknown screenshot format '{fmt}', use one of {SCREENSHOT_FORMATS}."
+            )
+        if fmt == "webp" and Image is None:
+            logger.warning("Pillow is not installed, saving screenshots as PNG.")
+            fmt = "png"
+        self.root_dir = root_dir
+        self.fmt = fmt
+        self.quality = quality
+
+        self._known_blobs: set[str] = set()
+        self._lock = threading.Lock()
+        self._stats = {"saved": 0, "deduplicated": 0, "bytes_written": 0, "errors": 0}
+        # Bounded, so a slow disk applies back-pressure instead of piling up images.
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(
+            target=self._writer, name="screenshot-writer", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def capture_options(self) -> dict:
+        """Arguments for Playwright's screenshot(): JPEG is encoded by the browser."""
+        if self.fmt == "jpeg":
+            return {"type": "jpeg", "quality": self.quality}
+        return {"type": "png"}
+
+    def save(self, namespace: str, filename: str, data: bytes) -> str:
+        """
+        Queues a captured image and returns the path it will be written to.
+        The file extension follows the configured format.
+        """
+        digest = hashlib.sha256(
+            f"{self.fmt}:{self.quality}:".encode("utf-8") + data
+        ).hexdigest()
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        path = os.path.join(self.root_dir, namespace, stem + _EXTENSIONS[self.fmt])
+        self._queue.put((digest, data, path))
+        return path
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(
+            self.root_dir, _BLOB_DIR, digest[:2], digest + _EXTENSIONS[self.fmt]
+        )
+
+    def _encode(self, data: bytes) -> bytes:
+        if self.fmt != "webp":
+            return data
+        output = io.BytesIO()
+        Image.open(io.BytesIO(data)).save(output, "WEBP", quality=self.quality)
+        return output.getvalue()
+
+    def _write(self, digest: str, data: bytes, path: str):
+        blob = self._blob_path(digest)
+        if digest in self._known_blobs or os.path.exists(blob):
+            with self._lock:
+                self._stats["deduplicated"] += 1
+        else:
+            encoded = self._encode(data)
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            with open(blob + ".tmp", "wb") as outfile:
+                outfile.write(encoded)
+            os.replace(blob + ".tmp", blob)
+            with self._lock:
+                self._stats["bytes_written"] += len(encoded)
+        self._known_blobs.add(digest)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.link(blob, path + ".tmp")
+        except FileExistsError:
+            os.remove(path + ".tmp")
+            os.link(blob, path + ".tmp")
+        except OSError:
+            shutil.copyfile(blob, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        with self._lock:
+            self._stats["saved"] += 1
+
+    def _writer(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._write(*job)
+            except Exception as e:
+                with self._lock:
+                    self._stats["errors"] += 1
+                logger.error(f"Could not write screenshot '{job[2]}': {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Blocks until every queued screenshot is on disk."""
+        self._queue.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        logger.info(f"Screenshot store '{self.root_dir}': {self.stats()}")
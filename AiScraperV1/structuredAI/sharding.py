@@ -0,0 +1,189 @@
+import csv
+import logging
+import multiprocessing
+import os
+
+from results_writer import NOT_PROCESSED, is_completed_row, load_completed_urls
+
+logger = logging.getLogger(__name__)
+
+
+def partition(urls: list[str], shards: int) -> list[list[str]]:
+    """Deals the URLs out round-robin, so every shard gets a similar mix of sites."""
+    return [urls[i::shards] for i in range(shards)]
+
+
+def _run_shard(
+    shard_input: str,
+    shard_output: str,
+    screenshot_dir: str,
+    resume: bool,
+    run_kwargs: dict,
+):
+    # Imported here so a spawned process sets up logging and its own LLM client.
+    import main
+
+    main.main_run(
+        input_csv_path=shard_input,
+        output_csv_path=shard_output,
+        screenshot_dir=screenshot_dir,
+        resume=resume,
+        **run_kwargs,
+    )
+
+
+class ShardedRun:
+    """
+    Runs main_run in several processes, each on its own slice of the input.
+
+    Every shard gets its own input and results CSV under `shard_dir` and its
+    own subdirectory of `screenshot_dir`, and launches its own browser. A shard that
+    crashes or leaves URLs unfinished is restarted in resume mode, up to
+    `max_retries` times. Finally the shard results are merged into a single
+    CSV in input order, together with the rows of URLs that were skipped
+    before sharding, e.g. by the preflight.
+    """
+
+    def __init__(
+        self,
+        shards: int,
+        shard_dir: str,
+        screenshot_dir: str,
+        max_retries: int = 2,
+        run_kwargs: dict | None = None,
+    ):
+        self.shards = max(1, shards)
+        self.shard_dir = shard_dir
+        self.screenshot_dir = screenshot_dir
+        self.max_retries = max_retries
+        self.run_kwargs = run_kwargs or {}
+
+    def _shard_paths(self, index: int) -> tuple[str, str, str]:
+        return (
+            os.path.join(self.shard_dir, f"shard_{index}.input.csv"),
+            os.path.join(self.shard_dir, f"shard_{index}.csv"),
+            os.path.join(self.screenshot_dir, f"shard_{index}"),
+        )
+
+    def run(
+        self,
+        urls: list[str],
+        output_csv_path: str,
+        fieldnames: list[str],
+        resume: bool = False,
+        targets: list[str] | None = None,
+        skipped: dict[int, dict] | None = None,
+    ):
+        """
+        Verifies `urls` in the shards. `targets` holds the URL to load for
+        every input position, by default the input URL itself. Positions in
+        `skipped` are not sent to any shard, their row is merged as given.
+        """
+        targets = targets or list(urls)
+        skipped = skipped or {}
+        os.makedirs(self.shard_dir, exist_ok=True)
+        slices = partition(
+            [target for index, target in enumerate(targets) if index not in skipped],
+            self.shards,
+        )
+        for index, shard_urls in enumerate(slices):
+            shard_input, _, _ = self._shard_paths(index)
+            with open(shard_input, "w", newline="", encoding="utf-8") as outfile:
+                writer = csv.writer(outfile)
+                writer.writerow(["URL"])
+                writer.writerows([url] for url in shard_urls)
+
+        # Spawn instead of fork: the parent may already hold threads and
+        # Playwright state that must not be copied into the children.
+        mp_context = multiprocessing.get_context("spawn")
+        pending = [index for index, shard_urls in enumerate(slices) if shard_urls]
+        for attempt in range(self.max_retries + 1):
+            processes = {}
+            for index in pending:
+                shard_input, shard_output, screenshot_dir = self._shard_paths(index)
+                process = mp_context.Process(
+                    target=_run_shard,
+                    args=(
+                        shard_input,
+                        shard_output,
+                        screenshot_dir,
+                        resume or attempt > 0,
+                        self.run_kwargs,
+                    ),
+                    name=f"shard-{index}",
+                )
+                process.start()
+                processes[index] = process
+            logger.info(
+                f"Started {len(processes)} shard process(es), attempt {attempt + 1}."
+            )
+
+            for process in processes.values():
+                process.join()
+
+            pending = [
+                index
+                for index, process in processes.items()
+                if process.exitcode != 0 or not self._is_complete(index, slices[index])
+            ]
+            if not pending:
+                break
+            logger.warning(
+                f"Shard(s) {pending} crashed or did not finish, retrying in resume mode."
+            )
+        else:
+            logger.error(
+                f"Shard(s) {pending} still incomplete after {self.max_retries} retries."
+            )
+
+        self.merge(urls, slices, output_csv_path, fieldnames, targets, skipped)
+
+    def _is_complete(self, index: int, shard_urls: list[str]) -> bool:
+        # A shard whose browsers all died still exits 0, but only writes
+        # placeholder rows, which do not count as completed.
+        _, shard_output, _ = self._shard_paths(index)
+        return set(shard_urls) <= load_completed_urls(shard_output)
+
+    def merge(
+        self,
+        urls: list[str],
+        slices: list[list[str]],
+        output_csv_path: str,
+        fieldnames: list[str],
+        targets: list[str] | None = None,
+        skipped: dict[int, dict] | None = None,
+    ):
+        """Writes the shard results and the skipped rows into one CSV in input order."""
+        targets = targets or list(urls)
+        skipped = skipped or {}
+        rows: dict[str, dict] = {}
+        for index in range(len(slices)):
+            _, shard_output, _ = self._shard_paths(index)
+            if not os.path.exists(shard_output):
+                continue
+            with open(shard_output, newline="", encoding="utf-8") as infile:
+                for row in csv.DictReader(infile):
+                    if is_completed_row(row) or row["url"] not in rows:
+                        rows[row["url"]] = row
+
+        with open(output_csv_path, "w", newline="", encoding="utf-8") as outfile:
+            writer = csv.DictWriter(
+                outfile, fieldnames=fieldnames, extrasaction="ignore"
+            )
+            writer.writeheader()
+            for index, url in enumerate(urls):
+                if index in skipped:
+                    writer.writerow(skipped[index])
+                elif targets[index] in rows:
+                    # Shards only know the target, report the input spelling.
+                    writer.writerow({**rows[targets[index]], "url": url})
+                else:
+                    writer.writerow(
+                        {
+                            "url": url,
+                            "raw_output_summary": f"{NOT_PROCESSED} by its shard.",
+                        }
+                    )
+        logger.info(
+            f"Merged {len(slices)} shard result file(s) into '{output_csv_path}'."
+        )
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import logging
+import re
+from dataclasses import asdict, dataclass
+
+import config
+from page_scripts import TCPA_CANDIDATES_JS
+
+logger = logging.getLogger(__name__)
+
+# (JavaScript regex source, weight). A block's text score combines the weights
+# of every pattern it matches as 1 - prod(1 - weight).
+TCPA_PATTERNS = [
+    (r"by (clicking|submitting|pressing|tapping|continuing|checking)", 0.5),
+    (r"(agree|consent)\s+to\s+(be\s+)?(contacted|receive|receiving|calls)", 0.6),
+    (r"express(ed)?\s+written\s+consent", 0.6),
+    (r"\bTCPA\b|telephone consumer protection", 0.6),
+    (r"consent is not (a )?(condition|required)", 0.5),
+    (
+        r"auto-?dial|automated (telephone )?(dialing|technology|calls)|pre-?recorded|artificial voice",
+        0.5,
+    ),
+    (r"text messages?|\bSMS\b|calls? (and|or) texts?", 0.3),
+    (r"marketing (calls|messages|communications)", 0.3),
+]
+_PATTERNS_ARG = [
+    {"source": source, "weight": weight} for source, weight in TCPA_PATTERNS
+]
+_PATTERNS_KEY = hashlib.sha1(json.dumps(_PATTERNS_ARG).encode("utf-8")).hexdigest()
+_COMPILED_PATTERNS = [
+    (re.compile(source, re.IGNORECASE), weight) for source, weight in TCPA_PATTERNS
+]
+# Blocks scoring lower are not TCPA candidates at all.
+MIN_TEXT_SCORE = 0.3
+
+
+def tcpa_text_score(text: str) -> float:
+    """The text score the in-page detector gives a block, computed in Python."""
+    miss = 1.0
+    for pattern, weight in _COMPILED_PATTERNS:
+        if pattern.search(text):
+            miss *= 1 - weight
+    return round(1 - miss, 3)
+
+
+@dataclass
+class TcpaCandidate:
+    selector: str
+    text: str
+    confidence: float
+    text_score: float
+    # Pixels to the nearest submit-type button, None if the page has none.
+    distance: int | None
+
+
+def find_tcpa_candidates(page, max_candidates: int = 5) -> list[TcpaCandidate]:
+    """Ranked TCPA disclaimer candidates on the page, best first, in one evaluate call."""
+    results = page.evaluate(
+        TCPA_CANDIDATES_JS,
+        {
+            "patterns": _PATTERNS_ARG,
+            "patternsKey": _PATTERNS_KEY,
+            "maxCandidates": max_candidates,
+            "maxTextLength": 300,
+            "maxBlockLength": 1500,
+            "minTextScore": MIN_TEXT_SCORE,
+            "proximityPx": 600,
+        },
+    )
+    return [
+        TcpaCandidate(
+            selector=result["selector"],
+            text=result["text"],
+            confidence=result["confidence"],
+            text_score=result["textScore"],
+            distance=result["distance"],
+        )
+        for result in results
+    ]
+
+
+def confirm_tcpa_disclaimer(
+    tool_manager, threshold: float = config.TCPA_CONFIDENCE_THRESHOLD
+) -> TcpaCandidate | None:
+    """
+    Returns the best candidate if it reaches the threshold and could be
+    screenshotted as tcpa_disclaimer.png, otherwise None so the LLM decides.
+    """
+    try:
+        candidates = find_tcpa_candidates(tool_manager.page)
+    except Exception as e:
+        logger.warning(f"TCPA detector could not read the page: {e}")
+        return None
+
+    if not candidates or candidates[0].confidence < threshold:
+        best = candidates[0].confidence if candidates else 0.0
+        logger.info(f"TCPA detector: no confident match (best confidence {best}).")
+        return None
+
+    best = candidates[0]
+    observation = tool_manager.get_tool("screenshot_element").invoke(
+        {"selector": best.selector, "filename": "tcpa_disclaimer.png"}
+    )
+    if str(observation).startswith("Error"):
+        logger.info(f"TCPA detector: match found but screenshot failed: {observation}")
+        return None
+
+    logger.info(
+        f"TCPA detector: confirmed '{best.text[:80]}' ({best.selector}), confidence {best.confidence}"
+    )
+    return best
+
+
+def format_candidates(candidates: list[TcpaCandidate]) -> str:
+    return json.dumps([asdict(c) for c in candidates], separators=(",", ":"))
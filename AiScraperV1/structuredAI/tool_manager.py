@@ -1,6 +1,9 @@
 import logging
 from playwright.sync_api import Page, BrowserContext
 
+import config
+from screenshot_store import ScreenshotStore
+
 # Import custom tools
 from tools import (
     FindInteractiveElementsTool,
@@ -8,6 +11,8 @@ from tools import (
     ScreenshotElementTool,
     CustomFillTool,
     ExtractFullPageTextTool,
+    FindTcpaDisclaimerTool,
+    FormActionsTool,
 )
 
 logger = logging.getLogger(__name__)
@@ -17,10 +22,21 @@ class ToolManager:
 
     # A class to create, hold, and manage the state of agent tools.
 
-    def __init__(self, browser, context: BrowserContext, page: Page):
+    def __init__(
+        self,
+        browser,
+        context: BrowserContext,
+        page: Page,
+        screenshot_dir: str = config.SCREENSHOT_DIR,
+        screenshot_store: ScreenshotStore | None = None,
+        screenshot_namespace: str = "",
+    ):
         self.browser = browser
         self.context = context
         self.page = page
+        self.screenshot_dir = screenshot_dir
+        self.screenshot_store = screenshot_store
+        self.screenshot_namespace = screenshot_namespace
         self.tools = self._create_tools()
         logger.info(
             f"ToolManager initialized with tools: {[t.name for t in self.tools]}"
@@ -29,13 +45,41 @@ class ToolManager:
     def _create_tools(self):
         scanner_tool = FindInteractiveElementsTool(page=self.page)
         click_tool = CustomClickTool(page=self.page, context=self.context, manager=self)
-        screenshot_tool = ScreenshotElementTool(page=self.page)
+        screenshot_tool = ScreenshotElementTool(
+            page=self.page,
+            output_dir=self.screenshot_dir,
+            store=self.screenshot_store,
+            namespace=self.screenshot_namespace,
+        )
         fill_tool = CustomFillTool(page=self.page, context=self.context)
         extract_text_tool = ExtractFullPageTextTool(page=self.page)
+        tcpa_tool = FindTcpaDisclaimerTool(page=self.page)
+        form_actions_tool = FormActionsTool(
+            page=self.page, context=self.context, manager=self
+        )
 
         # Return a list of all custom tools.
         # If you need any tools from PlayWrightBrowserToolkit, merge them here.
-        return [click_tool, fill_tool, scanner_tool, screenshot_tool, extract_text_tool]
+        return [
+            click_tool,
+            fill_tool,
+            scanner_tool,
+            screenshot_tool,
+            extract_text_tool,
+            tcpa_tool,
+            form_actions_tool,
+        ]
+
+    def get_tool(self, name: str):
+        return next(tool for tool in self.tools if tool.name == name)
+
+    @property
+    def screenshot_paths(self) -> list[str]:
+        return list(self.get_tool("screenshot_element").saved_paths.values())
+
+    def reset_scan_baseline(self):
+        """Called when the agent starts a new message history without any scans."""
+        self.get_tool("find_interactive_elements").has_baseline = False
 
     def update_page_context(self, new_page: Page):
         logger.info("ToolManager updating page context for all tools...")
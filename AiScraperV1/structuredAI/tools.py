@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import json
 from playwright.sync_api import Page, BrowserContext
@@ -5,10 +6,32 @@ from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 import os
 
+import config
+from page_scripts import INTERACTIVE_SNAPSHOT_JS, TEXT_BLOCKS_JS
+from history_manager import SCAN_DIFF_HEADER
+from page_settle import PageSettler
+from screenshot_store import ScreenshotStore
+from tcpa_detector import TCPA_PATTERNS, find_tcpa_candidates, format_candidates
+
 logger = logging.getLogger(__name__)
 
+# (JavaScript regex source, weight) used to rank page text blocks. The TCPA
+# wording weighs most, the other compliance topics follow.
+TEXT_RANK_PATTERNS = TCPA_PATTERNS + [
+    (r"\bconsent\b", 0.3),
+    (r"privacy (policy|notice|statement)", 0.3),
+    (r"terms (of (service|use)|(and|&) conditions)", 0.3),
+    (r"do not sell|opt[\s-]?out|privacy choices", 0.3),
+]
+_TEXT_RANK_PATTERNS_ARG = [
+    {"source": source, "weight": weight} for source, weight in TEXT_RANK_PATTERNS
+]
+_TEXT_RANK_PATTERNS_KEY = hashlib.sha1(
+    json.dumps(_TEXT_RANK_PATTERNS_ARG).encode("utf-8")
+).hexdigest()
+
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Literal
 
 if TYPE_CHECKING:
     from tool_manager import ToolManager
@@ -22,6 +45,12 @@ class ScreenshotElementTool(BaseTool):
         "Finds an element using a CSS selector and saves a screenshot of just that element to a file."
     )
     page: Page
+    output_dir: str = config.SCREENSHOT_DIR
+    # With a store, images are saved asynchronously under `namespace`.
+    store: ScreenshotStore | None = None
+    namespace: str = ""
+    # filename requested by the agent -> path the image was saved to
+    saved_paths: dict[str, str] = Field(default_factory=dict)
 
     class ScreenshotArgs(BaseModel):
         selector: str = Field(
@@ -35,15 +64,18 @@ class ScreenshotElementTool(BaseTool):
 
     def _run(self, selector: str, filename: str):
         try:
-            # Ensure the output directory exists
-            output_dir = "screenshots"
-            os.makedirs(output_dir, exist_ok=True)
-
             element = self.page.locator(selector).first
-            path = os.path.join(output_dir, filename)
 
-            element.screenshot(path=path)
+            if self.store:
+                data = element.screenshot(**self.store.capture_options)
+                path = self.store.save(self.namespace, filename, data)
+            else:
+                # Ensure the output directory exists
+                os.makedirs(self.output_dir, exist_ok=True)
+                path = os.path.join(self.output_dir, filename)
+                element.screenshot(path=path)
 
+            self.saved_paths[filename] = path
             logger.info(f"Saved screenshot of element '{selector}' to '{path}'")
             return f"Successfully saved screenshot to '{path}'."
         except Exception as e:
@@ -55,43 +87,152 @@ class FindInteractiveElementsTool(BaseTool):
 
     name: str = "find_interactive_elements"
     description: str = (
-        "Returns a JSON list of all interactive elements (buttons, links, inputs, selects) "
-        "on the current page, including their outer_html for selector creation."
+        "Returns a compact JSON snapshot of the interactive elements (buttons, links, inputs, selects) "
+        "on the current page. Each element has an id, tag, role, visible text, key attributes, "
+        "a unique CSS 'selector' to use with the other tools, visibility and bounding box. "
+        "After a fill or click on the same page, pass changes_only=true to get only the elements "
+        "that were added, changed or removed since your previous scan."
     )
     page: Page
+    max_elements: int = config.SCAN_MAX_ELEMENTS
+    max_chars: int = config.SCAN_MAX_CHARS
+    # Whether the agent has seen a scan in its current message history. Without
+    # one a diff would be meaningless, so changes_only then returns a full scan.
+    has_baseline: bool = False
+
+    class ScanArgs(BaseModel):
+        changes_only: bool = Field(
+            default=False,
+            description="Only report what changed since the previous scan of this page.",
+        )
 
-    def _run(self):
+    args_schema = ScanArgs
+
+    def _run(self, changes_only: bool = False):
         try:
-            elements = self.page.query_selector_all(
-                "a, button, input:not([type=hidden]), select, textarea, [role='button']"
+            # The whole snapshot is built in the page in a single round trip.
+            result = self.page.evaluate(
+                INTERACTIVE_SNAPSHOT_JS,
+                {
+                    "maxTextLength": 80,
+                    "maxAttrLength": 120,
+                    "diff": changes_only and self.has_baseline,
+                },
             )
-            element_list = [
-                {"outer_html": el.evaluate("element => element.outerHTML")}
-                for el in elements
-            ]
-            return json.dumps(element_list, indent=2)
         except Exception as e:
             return f"Error finding elements: {e}"
 
+        self.has_baseline = True
+        if result["mode"] == "diff":
+            return self._format_diff(result)
+        output = self._format_snapshot(result["records"])
+        if changes_only and result["newPage"]:
+            output += "\n(This is a new page, so the full snapshot is shown.)"
+        return output
+
+    def _format_diff(self, diff: dict) -> str:
+        if not (diff["added"] or diff["changed"] or diff["removed"]):
+            return f"{SCAN_DIFF_HEADER}: none ({diff['unchanged']} elements unchanged)."
+        parts = [f"{SCAN_DIFF_HEADER} ({diff['unchanged']} elements unchanged):"]
+        for key in ("added", "changed"):
+            if diff[key]:
+                parts.append(f"{key}: {self._format_snapshot(diff[key])}")
+        if diff["removed"]:
+            parts.append(f"removed ids: {', '.join(diff['removed'])}")
+        return "\n".join(parts)
+
+    def _format_snapshot(self, records: list[dict]) -> str:
+        total = len(records)
+        if total > self.max_elements:
+            # Drop hidden elements first, they are rarely what the agent needs.
+            records = [r for r in records if r.get("visible")] or records
+            records = records[: self.max_elements]
+
+        lines = [json.dumps(r, separators=(",", ":")) for r in records]
+        kept, size = [], 0
+        for line in lines:
+            if size + len(line) > self.max_chars:
+                break
+            kept.append(line)
+            size += len(line) + 1
+
+        output = "[" + ",\n".join(kept) + "]"
+        if len(kept) < total:
+            output += f"\n(Showing {len(kept)} of {total} elements; hidden or trailing elements were omitted.)"
+        return output
+
 
 class ExtractFullPageTextTool(BaseTool):
-    """A tool that extracts the entire plain text content from the current page."""
+    """A tool that returns the page text as ranked windows instead of one dump."""
 
     name: str = "extract_full_page_text"
     description: str = (
-        "Extracts and returns the entire visible plain text content of the current web page. "
-        "Useful for searching for specific text patterns or disclaimers."
+        "Returns the visible text of the current web page split into blocks, ranked so that "
+        "consent/TCPA, privacy, terms and do-not-sell wording comes first. Each window has a "
+        "rank, a keyword score, a CSS 'selector' and the block's text. Pass page_number=2, 3, ... "
+        "to read further windows. Useful for searching for specific text patterns or disclaimers."
     )
     page: Page
+    windows_per_page: int = config.TEXT_WINDOWS_PER_PAGE
+    max_text_length: int = 400
 
-    def _run(self):
+    class ExtractTextArgs(BaseModel):
+        page_number: int = Field(
+            default=1, description="Which page of ranked windows to return, from 1."
+        )
+
+    args_schema = ExtractTextArgs
+
+    def _run(self, page_number: int = 1):
         try:
-            # Evaluate JavaScript to get the innerText of the body
-            full_text = self.page.evaluate("document.body.innerText")
-            return full_text
+            page_number = max(1, page_number)
+            result = self.page.evaluate(
+                TEXT_BLOCKS_JS,
+                {
+                    "patterns": _TEXT_RANK_PATTERNS_ARG,
+                    "patternsKey": _TEXT_RANK_PATTERNS_KEY,
+                    "page": page_number,
+                    "pageSize": self.windows_per_page,
+                    "maxTextLength": self.max_text_length,
+                    "maxBlockLength": 1500,
+                    "minTextLength": 3,
+                },
+            )
         except Exception as e:
             return f"Error extracting full page text: {e}"
 
+        windows = result["windows"]
+        lines = [json.dumps(w, separators=(",", ":")) for w in windows]
+        output = "[" + ",\n".join(lines) + "]"
+        if not windows:
+            return output + f"\n(No text windows on page {page_number}.)"
+        first, last = windows[0]["rank"], windows[-1]["rank"]
+        output += (
+            f"\n(Windows {first}-{last} of {result['total']} text blocks, "
+            f"{result['matching']} contain compliance keywords."
+        )
+        if last < result["total"]:
+            output += f" Call again with page_number={page_number + 1} for more."
+        return output + ")"
+
+
+class FindTcpaDisclaimerTool(BaseTool):
+    """A tool that ranks the page's text blocks as TCPA disclaimer candidates."""
+
+    name: str = "find_tcpa_disclaimer"
+    description: str = (
+        "Scans the visible text outside the footer for TCPA consent language and returns "
+        "ranked candidates with a CSS 'selector', the text and a 'confidence' between 0 and 1 "
+        "based on the wording and the distance to the nearest submit button."
+    )
+    page: Page
+
+    def _run(self):
+        try:
+            return format_candidates(find_tcpa_candidates(self.page))
+        except Exception as e:
+            return f"Error finding TCPA disclaimer: {e}"
+
 
 class CustomFillTool(BaseTool):
     """A tool that fills an input field with the given value."""
@@ -113,8 +254,10 @@ class CustomFillTool(BaseTool):
 
     def _run(self, selector: str, value: str):
         try:
-            self.page.fill(selector, value)
-            return f"Successfully filled element with selector '{selector}' with value '{value}'."
+            with PageSettler(self.page, self.context) as settler:
+                self.page.fill(selector, value)
+                settle = settler.wait()
+            return f"Successfully filled element with selector '{selector}' with value '{value}' ({settle.describe()})."
         except Exception as e:
             return f"Error filling element with selector '{selector}': {e}"
 
@@ -137,21 +280,104 @@ class CustomClickTool(BaseTool):
 
     def _run(self, selector: str):
         try:
-            current_page_count = len(self.context.pages)
-            # Use page.click for robustness, adding a timeout
-            self.page.click(selector, timeout=10000)
-            self.page.wait_for_timeout(2500)  # Give page some time to react/load
+            with PageSettler(self.page, self.context) as settler:
+                # Use page.click for robustness, adding a timeout
+                self.page.click(selector, timeout=10000)
+                # Returns as soon as the page is quiet or a new tab has loaded
+                settle = settler.wait()
 
             # Check for new tabs
-            if len(self.context.pages) > current_page_count:
+            if settle.new_page:
                 logger.info("New tab detected! Updating manager...")
-                # The new page is typically the last one created
-                new_page = self.context.pages[-1]
+                new_page = settle.new_page
                 new_page.bring_to_front()  # Bring it to foreground if headless=False
                 # Let the manager handle updating all tools
                 self.manager.update_page_context(new_page)
-                return "Successfully clicked element and switched to the new tab."
+                return f"Successfully clicked element and switched to the new tab ({settle.describe()})."
             else:
-                return f"Successfully clicked element with selector: '{selector}'."
+                return f"Successfully clicked element with selector: '{selector}' ({settle.describe()})."
         except Exception as e:
             return f"Error clicking element with selector '{selector}': {e}"
+
+
+class FormStep(BaseModel):
+    action: Literal["fill", "select", "check", "click"] = Field(
+        description="'fill' types `value` into an input, 'select' picks the option with "
+        "`value` as value or label, 'check' ticks a checkbox or radio, 'click' clicks."
+    )
+    selector: str = Field(description="A valid CSS selector for the element.")
+    value: str = Field(default="", description="The value for 'fill' and 'select'.")
+
+
+class FormActionsTool(BaseTool):
+    """A tool that runs a whole page of form steps in one call."""
+
+    name: str = "form_actions"
+    description: str = (
+        "Runs an ordered list of form steps (fill, select, check, click) back to back, e.g. "
+        "fill every field of the current form page and then click 'Continue'. Stops at the "
+        "first step that fails, waits once for the page to settle and returns the result of "
+        "every step followed by a find_interactive_elements snapshot of the resulting page."
+    )
+    page: Page
+    context: BrowserContext
+    manager: "ToolManager"  # Reference to the manager to update all tools
+    step_timeout_ms: int = 10000
+
+    class FormActionsArgs(BaseModel):
+        steps: list[FormStep] = Field(description="The steps to run, in order.")
+
+    args_schema = FormActionsArgs
+
+    def _run_step(self, step: FormStep):
+        if step.action == "fill":
+            self.page.fill(step.selector, step.value, timeout=self.step_timeout_ms)
+        elif step.action == "select":
+            self.page.select_option(
+                step.selector, step.value, timeout=self.step_timeout_ms
+            )
+        elif step.action == "check":
+            self.page.check(step.selector, timeout=self.step_timeout_ms)
+        else:
+            self.page.click(step.selector, timeout=self.step_timeout_ms)
+
+    def _run(self, steps: list[FormStep]):
+        steps = [FormStep.model_validate(step) for step in steps]
+        results = []
+        try:
+            with PageSettler(self.page, self.context) as settler:
+                for number, step in enumerate(steps, start=1):
+                    target = f"{step.action} '{step.selector}'"
+                    if step.action in ("fill", "select"):
+                        target += f" = '{step.value}'"
+                    try:
+                        self._run_step(step)
+                    except Exception as e:
+                        results.append(f"{number}. {target}: Error: {e}")
+                        break
+                    results.append(f"{number}. {target}: ok")
+                # Settle once for the whole batch instead of after every step.
+                settle = settler.wait()
+        except Exception as e:
+            return f"Error running form steps: {e}"
+
+        if settle.new_page:
+            logger.info("New tab detected! Updating manager...")
+            self.manager.update_page_context(settle.new_page)
+
+        failed = bool(results) and not results[-1].endswith(": ok")
+        header = (
+            f"Stopped at step {len(results)} of {len(steps)}"
+            if failed
+            else f"Ran all {len(steps)} step(s)"
+        )
+        if settle.new_page:
+            header += ", switched to the new tab"
+        snapshot = self.manager.get_tool("find_interactive_elements")._run(
+            changes_only=True
+        )
+        return (
+            f"{header} ({settle.describe()}):\n"
+            + "\n".join(results)
+            + f"\nPage after the steps:\n{snapshot}"
+        )
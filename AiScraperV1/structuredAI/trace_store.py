@@ -0,0 +1,161 @@
+"""
+Compressed, append-only store of the agents' message histories.
+
+Every URL gets a trace id, and the message history of each FSM state is
+appended as one zlib-compressed chunk as soon as the state ends. The results
+CSV only holds a reference of the form '<store path>#<trace id>'. Read a
+trace back with TraceReader or from the command line:
+
+    python trace_store.py results.traces.sqlite https://example.com
+    python trace_store.py "results.traces.sqlite#42"
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+
+from langchain_core.messages import BaseMessage, message_to_dict
+
+from preflight import normalize_url
+
+logger = logging.getLogger(__name__)
+
+
+class TraceStore:
+    """Writes traces to a SQLite file. Safe to share between worker threads."""
+
+    def __init__(self, path: str, compression_level: int = 6):
+        self.path = path
+        self.compression_level = compression_level
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS traces ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT, created_at REAL);"
+            "CREATE INDEX IF NOT EXISTS traces_url ON traces (url);"
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "trace_id INTEGER, seq INTEGER, state TEXT, raw_size INTEGER, data BLOB, "
+            "PRIMARY KEY (trace_id, seq));"
+        )
+        self._conn.commit()
+
+    def begin(self, url: str) -> int:
+        """Starts the trace of one URL and returns its id."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO traces (url, created_at) VALUES (?, ?)",
+                (url, time.time()),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def append(self, trace_id: int, state: str, messages: list[BaseMessage]):
+        raw = json.dumps([message_to_dict(m) for m in messages], default=str).encode(
+            "utf-8"
+        )
+        data = zlib.compress(raw, self.compression_level)
+        with self._lock:
+            seq = self._conn.execute(
+                "SELECT COUNT(*) FROM chunks WHERE trace_id = ?", (trace_id,)
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT INTO chunks VALUES (?, ?, ?, ?, ?)",
+                (trace_id, seq, state, len(raw), data),
+            )
+            self._conn.commit()
+            self.raw_bytes += len(raw)
+            self.stored_bytes += len(data)
+
+    def reference(self, trace_id: int) -> str:
+        return f"{self.path}#{trace_id}"
+
+    def close(self):
+        ratio = self.raw_bytes / self.stored_bytes if self.stored_bytes else 0
+        logger.info(
+            f"Trace store '{self.path}': {self.stored_bytes / 1024:.0f} KB stored "
+            f"({ratio:.1f}x compression)."
+        )
+        self._conn.close()
+
+
+class TraceReader:
+    """Reads traces back, by trace id or by URL."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    @classmethod
+    def from_reference(cls, reference: str) -> tuple["TraceReader", int]:
+        path, _, trace_id = reference.rpartition("#")
+        return cls(path), int(trace_id)
+
+    def trace_ids(self, url: str) -> list[int]:
+        """Ids of every trace recorded for the URL, newest first."""
+        # Traces are recorded under the URL the browser loaded, see preflight.
+        rows = self._conn.execute(
+            "SELECT id FROM traces WHERE url IN (?, ?) ORDER BY id DESC",
+            (url, normalize_url(url)),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def get(self, trace_id: int) -> list[dict]:
+        """The trace as a list of {"state": ..., "messages": [...]} per FSM state."""
+        rows = self._conn.execute(
+            "SELECT state, data FROM chunks WHERE trace_id = ? ORDER BY seq",
+            (trace_id,),
+        ).fetchall()
+        return [
+            {"state": state, "messages": json.loads(zlib.decompress(data))}
+            for state, data in rows
+        ]
+
+    def format(self, trace_id: int) -> str:
+        """Readable text of a trace, one block per message."""
+        blocks = []
+        for chunk in self.get(trace_id):
+            blocks.append(f"=== {chunk['state']} ===")
+            for message in chunk["messages"]:
+                data = message["data"]
+                text = f"[{message['type']}] {data.get('content', '')}"
+                for call in data.get("tool_calls") or []:
+                    text += f"\n  -> {call['name']}({json.dumps(call['args'])})"
+                blocks.append(text)
+        return "\n\n".join(blocks)
+
+    def close(self):
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print an agent trace.")
+    parser.add_argument(
+        "store", help="Trace store file, or a full '<store>#<id>' reference."
+    )
+    parser.add_argument(
+        "url", nargs="?", help="Print the latest trace of this URL instead."
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the raw messages as JSON."
+    )
+    args = parser.parse_args()
+
+    if args.url:
+        reader = TraceReader(args.store)
+        ids = reader.trace_ids(args.url)
+        if not ids:
+            raise SystemExit(f"No trace for '{args.url}' in '{args.store}'.")
+        trace_id = ids[0]
+    else:
+        reader, trace_id = TraceReader.from_reference(args.store)
+
+    if args.json:
+        print(json.dumps(reader.get(trace_id), indent=2))
+    else:
+        print(reader.format(trace_id))
+    reader.close()
@@ -0,0 +1,114 @@
+import logging
+import queue
+import threading
+from typing import Callable
+
+from playwright.sync_api import BrowserContext, sync_playwright
+
+from browser_pool import BrowserPool
+from results_writer import NOT_PROCESSED
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserWorkerPool:
+    """
+    Verifies a list of URLs with a fixed number of worker threads.
+
+    Sync Playwright objects can only be used from the thread that created them,
+    so every worker starts its own Playwright driver and BrowserPool, which
+    gives each URL a fresh context and recycles the browser. The workers pull
+    URLs from a shared queue and report every result together with its input
+    index, so callers can restore the original order.
+    """
+
+    def __init__(
+        self,
+        verify_fn: Callable[[BrowserContext, str], dict],
+        workers: int = 1,
+        headless: bool = True,
+        launch_timeout: int = 60000,
+        block_resources: bool = False,
+    ):
+        self.verify_fn = verify_fn
+        self.workers = max(1, workers)
+        self.headless = headless
+        self.launch_timeout = launch_timeout
+        self.block_resources = block_resources
+
+    def run(self, urls: list[str], on_result: Callable[[int, dict], None]):
+        """
+        Verifies every URL and hands each result row to `on_result` together
+        with the URL's index in `urls` as soon as it is ready.
+        """
+        jobs: queue.Queue = queue.Queue()
+        for index, url in enumerate(urls):
+            jobs.put((index, url))
+        done: set[int] = set()
+
+        def deliver(index: int, row: dict):
+            done.add(index)
+            on_result(index, row)
+
+        threads = [
+            threading.Thread(
+                target=self._worker,
+                args=(jobs, deliver),
+                name=f"worker-{n}",
+                daemon=True,
+            )
+            for n in range(min(self.workers, len(urls)))
+        ]
+        logger.info(f"Starting {len(threads)} worker(s) for {len(urls)} URL(s).")
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Anything still missing was never picked up, e.g. every browser failed to launch.
+        for index, url in enumerate(urls):
+            if index not in done:
+                on_result(
+                    index,
+                    {
+                        "url": url,
+                        "raw_output_summary": f"{NOT_PROCESSED}.",
+                    },
+                )
+
+    def _worker(self, jobs: queue.Queue, deliver: Callable[[int, dict], None]):
+        with sync_playwright() as p:
+            browser_pool = BrowserPool(
+                p,
+                headless=self.headless,
+                launch_timeout=self.launch_timeout,
+                block_resources=self.block_resources,
+            )
+            try:
+                while True:
+                    try:
+                        index, url = jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    try:
+                        with browser_pool.context() as context:
+                            row = self.verify_fn(context, url)
+                    except Exception as e:
+                        # A failed relaunch costs this URL, not the rest of the queue.
+                        logger.error(
+                            f"Browser error while verifying '{url}': {e}", exc_info=True
+                        )
+                        row = {
+                            "url": url,
+                            "raw_output_summary": f"{NOT_PROCESSED} (browser error: {e}).",
+                        }
+                    deliver(index, row)
+
+            except Exception as e:
+                logger.error(
+                    f"A critical error occurred during the browser session: {e}",
+                    exc_info=True,
+                )
+            finally:
+                browser_pool.close()
+                logger.info(f"Browser pool stats: {browser_pool.stats()}")